@@ -0,0 +1,195 @@
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import resource
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import mock_github
+
+# Offline throughput benchmark for the hot paths: paging PRs from the API
+# (against mock_github.py), writing them with insert_prs, and building the
+# report. Every stage runs in a fresh process so peak RSS is its own.
+SIZES = [10_000, 1_000_000, 10_000_000]
+FETCH_REPOS = 8
+FETCH_PRS_PER_REPO = 2_000
+INSERT_REPOS = 20
+INSERT_BATCH = 20_000
+REPO_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux, bytes on macOS; children covers render workers
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return round(max(own, children) / scale, 1)
+
+def import_fetcher(workdir):
+    os.chdir(workdir)
+    sys.path.insert(0, REPO_ROOT)
+    import fetch_prs_to_sqlite_2025only as fetcher
+    return fetcher
+
+def serve_mock(port, repos, prs_per_repo, secondary_every, ready):
+    source = mock_github.SyntheticSource(repos, prs_per_repo, spacing=60)
+    # A quota big enough that the scheduler never spaces requests; this measures the client
+    limiter = mock_github.RateLimiter(limit=10**9, secondary_every=secondary_every, retry_after=1)
+    server = mock_github.make_server(source, limiter, port=port)
+    ready.put(server.server_address[1])
+    server.serve_forever()
+
+def fetch_stage(workdir, api_url, repos, backend, workers):
+    from concurrent.futures import ThreadPoolExecutor
+    fetcher = import_fetcher(workdir)
+    fetcher.configure_session(workers, token="bench", api_url=api_url)
+    fetch = fetcher.FETCH_BACKENDS[backend]
+    # Wide window so every synthetic page is in range
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        prs = sum(len(result) for result in pool.map(
+            lambda repo: fetch(repo, time_start="2000-01-01T00:00:00Z", time_end="2100-01-01T00:00:00Z"), repos))
+    elapsed = time.perf_counter() - started
+    metrics = fetcher.SCHEDULER.metrics()
+    return {
+        "stage": f"fetch ({backend}, {workers} workers)", "rows": prs, "seconds": round(elapsed, 2),
+        "pages_per_s": round(metrics["calls"] / elapsed, 1), "rows_per_s": round(prs / elapsed),
+        "retries": metrics["retries"], "peak_rss_mb": peak_rss_mb(),
+    }
+
+def insert_stage(workdir, db_file, size):
+    fetcher = import_fetcher(workdir)
+    import make_gh_pages
+    # Spread PRs over the report window so every row is charted
+    start = datetime.fromisoformat(make_gh_pages.TIME_START.replace("Z", "+00:00")).timestamp()
+    end = datetime.fromisoformat(make_gh_pages.TIME_END.replace("Z", "+00:00")).timestamp()
+    per_repo = max(size // INSERT_REPOS, 1)
+    source = mock_github.SyntheticSource(INSERT_REPOS, per_repo, users=max(500, size // 20),
+                                         spacing=max((end - start) / per_repo, 0.001))
+    source.latest = end - 1
+
+    conn = fetcher.connect_db(db_file)
+    fetcher.create_db_schema(conn)
+    rows = 0
+    started = time.perf_counter()
+    for repo, n in source.repos.items():
+        for first in range(1, n + 1, INSERT_BATCH):
+            batch = [source.pr(repo, k) for k in range(first, min(first + INSERT_BATCH, n + 1))]
+            batch = [pr for pr in batch if pr["user"]["type"] != "Bot"]
+            fetcher.insert_prs(conn, repo, batch)
+            rows += len(batch)
+    elapsed = time.perf_counter() - started
+    conn.close()
+    return {
+        "stage": f"insert_prs {size:,}", "rows": rows, "seconds": round(elapsed, 2),
+        "rows_per_s": round(rows / elapsed), "peak_rss_mb": peak_rss_mb(),
+    }
+
+REPORT_MODES = {"summary": "summary tables", "streaming": "streaming", "parquet": "parquet + DuckDB"}
+
+def report_stage(workdir, db_file, size, mode, workers):
+    os.chdir(workdir)
+    sys.path.insert(0, REPO_ROOT)
+    import make_gh_pages
+    output_dir = os.path.join(workdir, f"docs-{size}-{mode}")
+    os.makedirs(output_dir, exist_ok=True)
+
+    timings = {}
+    conn = sqlite3.connect(db_file)
+    if mode == "parquet":
+        import export_parquet
+        parquet_dir = os.path.join(workdir, f"parquet-{size}")
+        export_started = time.perf_counter()
+        export_parquet.export_parquet(conn, parquet_dir, full=True)
+        timings["export_s"] = time.perf_counter() - export_started
+    started = time.perf_counter()
+    if mode == "parquet":
+        daily, linked = make_gh_pages.load_daily_from_parquet(parquet_dir)
+    else:
+        daily, linked = make_gh_pages.load_daily(conn, streaming=mode == "streaming")
+    timings["load_s"] = time.perf_counter() - started
+    data = make_gh_pages.build_chart_data(daily, linked)
+    timings["aggregate_s"] = time.perf_counter() - started - timings["load_s"]
+    conn.close()
+    render_started = time.perf_counter()
+    jobs = make_gh_pages.chart_jobs(data)
+    make_gh_pages.render_charts(jobs, "png", output_dir, workers, force=True)
+    timings["render_s"] = time.perf_counter() - render_started
+    elapsed = time.perf_counter() - started
+    return {
+        "stage": f"report {size:,} ({REPORT_MODES[mode]})", "rows": len(daily),
+        "seconds": round(elapsed, 2), **{k: round(v, 2) for k, v in timings.items()}, "peak_rss_mb": peak_rss_mb(),
+    }
+
+def stage_main(results, quiet, fn, args):
+    # Child process entry: run one stage and hand its numbers back
+    with contextlib.ExitStack() as stack:
+        if quiet:
+            devnull = stack.enter_context(open(os.devnull, "w"))
+            stack.enter_context(contextlib.redirect_stdout(devnull))
+            stack.enter_context(contextlib.redirect_stderr(devnull))
+        results.put(fn(*args))
+
+def run_stage(ctx, quiet, fn, *args):
+    results = ctx.Queue()
+    process = ctx.Process(target=stage_main, args=(results, quiet, fn, args))
+    process.start()
+    result = results.get()
+    process.join()
+    print_result(result)
+    return result
+
+def print_result(result):
+    extras = ", ".join(f"{k}={v}" for k, v in result.items() if k not in ("stage", "seconds"))
+    print(f"{result['stage']:<45} {result['seconds']:>9.2f}s  {extras}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark fetch, insert and report throughput offline")
+    parser.add_argument("--sizes", default=",".join(str(s) for s in SIZES),
+                        help="comma separated synthetic DB sizes in PRs (default 10000,1000000,10000000)")
+    parser.add_argument("--fetch-workers", type=int, default=4)
+    parser.add_argument("--render-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--secondary-every", type=int, default=0,
+                        help="have the mock answer every Nth request with 403 + Retry-After")
+    parser.add_argument("--skip-fetch", action="store_true")
+    parser.add_argument("--workdir", help="keep DBs and outputs here instead of a temp dir")
+    parser.add_argument("--json", help="also write the results to this file")
+    parser.add_argument("--verbose", action="store_true", help="show the progress output of each stage")
+    args = parser.parse_args()
+
+    ctx = multiprocessing.get_context("spawn")
+    workdir = args.workdir or tempfile.mkdtemp(prefix="pr-bench-")
+    os.makedirs(workdir, exist_ok=True)
+    quiet = not args.verbose
+    results = []
+    print(f"Working in {workdir}")
+
+    if not args.skip_fetch:
+        ready = ctx.Queue()
+        server = ctx.Process(target=serve_mock, args=(0, FETCH_REPOS, FETCH_PRS_PER_REPO, args.secondary_every, ready),
+                             daemon=True)
+        server.start()
+        api_url = f"http://127.0.0.1:{ready.get()}"
+        repos = [f"bench-org/repo{i:03d}" for i in range(FETCH_REPOS)]
+        for backend in ("rest", "graphql"):
+            results.append(run_stage(ctx, quiet, fetch_stage, workdir, api_url, repos, backend, args.fetch_workers))
+        server.terminate()
+
+    for size in (int(s) for s in args.sizes.split(",")):
+        db_file = os.path.join(workdir, f"bench_{size}.db")
+        if os.path.exists(db_file):
+            os.remove(db_file)
+        results.append(run_stage(ctx, quiet, insert_stage, workdir, db_file, size))
+        for mode in REPORT_MODES:
+            results.append(run_stage(ctx, quiet, report_stage, workdir, db_file, size, mode, args.render_workers))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+import argparse
+import sys
+import time
+
+import fetch_prs_to_sqlite_2025only as fetcher
+
+# One entry point for the collector and the report. "cycle" runs collect ->
+# burst update (-> correlations) (-> Parquet export) -> report in one process, optionally
+# forever (--every), so a long-lived process pays the pandas/matplotlib import cost once.
+REPORT_COMMANDS = ("report", "cycle")
+
+def run_collect(args):
+    failed = fetcher.collect_from_args(args)
+    if failed:
+        print(f"\n{len(failed)} repositories failed: {', '.join(failed)}. Rerun to resume them.")
+    else:
+        print("\nAll repositories processed.")
+
+def run_report(args):
+    import make_gh_pages
+    print(make_gh_pages.build_report(make_gh_pages.config_from_args(args)))
+
+def run_cycle(args):
+    import sqlite3
+    import detect_bursts
+    import make_gh_pages
+    # The report covers the window that was collected
+    report_config = make_gh_pages.ReportConfig(db_path=args.db, output_dir=args.output, format=args.format,
+                                               workers=args.render_workers, parquet_dir=args.parquet,
+                                               time_start=args.since, time_end=args.until)
+    while True:
+        started = time.time()
+        failed = fetcher.collect_from_args(args)
+        conn = sqlite3.connect(args.db)
+        touched, _ = detect_bursts.update_bursts(conn)
+        if args.correlate:
+            import correlate_accounts
+            correlate_accounts.correlate(conn, args.since, args.until)
+        if args.parquet:
+            import export_parquet
+            export_parquet.export_parquet(conn, args.parquet)
+        conn.close()
+        summary = make_gh_pages.build_report(report_config)
+        print(f"Cycle done in {time.time() - started:.0f}s: {len(failed)} repos failed, "
+              f"{len(touched)} accounts re-checked for bursts. {summary}")
+        if not args.every:
+            return
+        time.sleep(max(args.every * 60 - (time.time() - started), 0))
+
+def main():
+    parser = argparse.ArgumentParser(description="Collect PRs and build the report")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    collect = commands.add_parser("collect", help="fetch PRs for the target repos into SQLite")
+    fetcher.add_arguments(collect)
+    collect.set_defaults(run=run_collect)
+
+    # Only the report commands import the report module (pandas); collect stays light
+    if len(sys.argv) > 1 and sys.argv[1] in REPORT_COMMANDS:
+        import make_gh_pages
+        report = commands.add_parser("report", help="build the GitHub Pages report from the DB")
+        make_gh_pages.add_arguments(report)
+        report.set_defaults(run=run_report)
+
+        cycle = commands.add_parser("cycle", help="collect, update bursts and rebuild the report in one process")
+        fetcher.add_arguments(cycle)
+        cycle.add_argument("--format", choices=make_gh_pages.OUTPUT_FORMATS, default="png")
+        cycle.add_argument("--output", default=make_gh_pages.OUTPUT_DIR,
+                           help=f"report directory (default {make_gh_pages.OUTPUT_DIR})")
+        cycle.add_argument("--render-workers", type=int, default=make_gh_pages.RENDER_WORKERS)
+        cycle.add_argument("--parquet", metavar="DIR",
+                           help="export changed partitions to Parquet in DIR after each collect and report from it with DuckDB")
+        cycle.add_argument("--correlate", action="store_true",
+                           help="recompute account and repo correlations for the window so the report includes them")
+        cycle.add_argument("--every", type=float, help="repeat every this many minutes instead of running once")
+        cycle.set_defaults(run=run_cycle)
+    else:
+        commands.add_parser("report", help="build the GitHub Pages report from the DB")
+        commands.add_parser("cycle", help="collect, update bursts and rebuild the report in one process")
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+    load_dotenv()
+    args.run(args)
+
+if __name__ == "__main__":
+    main()
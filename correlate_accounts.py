@@ -0,0 +1,188 @@
+import sqlite3
+import argparse
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from tqdm import tqdm
+
+# Configuration
+DB_PATH = "pull_requests_2025.db"
+TIME_START = "2025-04-17T00:00:00Z"
+TIME_END = "2025-05-21T23:59:59Z"
+MIN_REPOS = 2  # same bar as the report: accounts with PRs to at least 2 repos
+TOP_K = 10
+CANDIDATES_PER_USER = 50  # Jaccard shortlist per account before timing is scored
+TIMING_SCALE_HOURS = 24.0  # first PRs this far apart score exp(-1)
+TIMING_WEIGHT = 0.5  # score = (1 - w) * jaccard + w * timing
+BLOCK_NNZ = 5_000_000  # bound on the user x user product built at once
+
+def load_incidence(conn, time_start=TIME_START, time_end=TIME_END):
+    # One row per (user, repo) in the window with the user's first PR time there
+    pairs = pd.read_sql_query(
+        """
+        SELECT user_login, repo, MIN(created_at) AS first_pr_at
+        FROM pull_requests
+        WHERE created_at BETWEEN ? AND ? AND user_login IS NOT NULL
+        GROUP BY user_login, repo
+        """,
+        conn, params=(time_start, time_end),
+    )
+    user_codes, users = pd.factorize(pairs["user_login"])
+    repo_codes, repos = pd.factorize(pairs["repo"])
+    shape = (len(users), len(repos))
+
+    incidence = sparse.csr_matrix((np.ones(len(pairs), dtype=np.int32), (user_codes, repo_codes)), shape=shape)
+    # Hours since the window start, +1 so no stored value is 0
+    hours = (pd.to_datetime(pairs["first_pr_at"]) - pd.Timestamp(time_start)).dt.total_seconds().to_numpy() / 3600 + 1
+    first_pr = sparse.csr_matrix((hours, (user_codes, repo_codes)), shape=shape)
+    return incidence, first_pr, np.asarray(users, dtype=object), np.asarray(repos, dtype=object)
+
+def repo_similarity(incidence, repos):
+    # repo x repo co-contribution counts from one sparse product
+    co = (incidence.T @ incidence).tocoo()
+    degree = np.asarray(incidence.sum(axis=0)).ravel()
+    keep = co.row < co.col
+    a, b, shared = co.row[keep], co.col[keep], co.data[keep]
+    jaccard = shared / (degree[a] + degree[b] - shared)
+    return pd.DataFrame({
+        "repo_a": repos[a], "repo_b": repos[b], "shared_users": shared.astype(int), "jaccard": jaccard,
+    }).sort_values(["jaccard", "shared_users"], ascending=False, ignore_index=True)
+
+def row_blocks(incidence, budget=BLOCK_NNZ):
+    # Group rows so each block's row x all-users product stays under budget;
+    # a row's product size is bounded by the summed degree of its repos
+    repo_degree = np.asarray(incidence.sum(axis=0)).ravel()
+    row_cost = incidence @ repo_degree
+    start, total = 0, 0
+    for row, cost in enumerate(row_cost):
+        if total and total + cost > budget:
+            yield start, row
+            start, total = row, 0
+        total += cost
+    if start < incidence.shape[0]:
+        yield start, incidence.shape[0]
+
+def top_candidates(shared, degree, rows, k):
+    # Per row, the k columns with the highest Jaccard (self excluded)
+    shared = shared.tocoo()
+    keep = shared.row + rows[0] != shared.col
+    r, c, s = shared.row[keep], shared.col[keep], shared.data[keep]
+    jaccard = s / (degree[r + rows[0]] + degree[c] - s)
+    # COO from CSR is already grouped by row, so a stable sort on -jaccard
+    # within each row is one argsort of row + (1 - jaccard) / 2
+    order = np.argsort(r + (1 - jaccard) / 2, kind="stable")
+    r, c, s, jaccard = r[order], c[order], s[order], jaccard[order]
+    starts = np.searchsorted(r, r, side="left")
+    rank = np.arange(len(r)) - starts
+    keep = rank < k
+    return r[keep] + rows[0], c[keep], s[keep], jaccard[keep]
+
+def timing_proximity(incidence, first_pr, u, v):
+    # Mean exp(-|dt| / scale) over the repos both accounts contributed to
+    shared = incidence[u].multiply(incidence[v]).tocoo()
+    dt = np.abs(np.asarray(first_pr[u[shared.row], shared.col]).ravel()
+                - np.asarray(first_pr[v[shared.row], shared.col]).ravel())
+    closeness = np.exp(-dt / TIMING_SCALE_HOURS)
+    total = np.bincount(shared.row, weights=closeness, minlength=len(u))
+    count = np.bincount(shared.row, minlength=len(u))
+    return total / np.maximum(count, 1)
+
+def account_similarity(incidence, first_pr, users, min_repos=MIN_REPOS, k=TOP_K):
+    degree = np.asarray(incidence.sum(axis=1)).ravel()
+    qualified = np.flatnonzero(degree >= min_repos)
+    incidence, first_pr, users, degree = incidence[qualified], first_pr[qualified], users[qualified], degree[qualified]
+    incidence_t = incidence.T.tocsr()
+
+    results = []
+    blocks = list(row_blocks(incidence))
+    for start, end in tqdm(blocks, desc="Account similarity", unit="block"):
+        shared = incidence[start:end] @ incidence_t
+        u, v, s, jaccard = top_candidates(shared, degree, (start, end), CANDIDATES_PER_USER)
+        timing = timing_proximity(incidence, first_pr, u, v)
+        results.append(pd.DataFrame({
+            "user": u, "other": v, "shared_repos": s.astype(int), "jaccard": jaccard, "timing": timing,
+        }))
+    if not results:
+        return pd.DataFrame(columns=["user_login", "rank", "other_login", "shared_repos", "jaccard", "timing", "score"])
+
+    pairs = pd.concat(results, ignore_index=True)
+    pairs["score"] = (1 - TIMING_WEIGHT) * pairs["jaccard"] + TIMING_WEIGHT * pairs["timing"]
+    pairs = pairs.sort_values(["user", "score", "shared_repos"], ascending=[True, False, False])
+    pairs["rank"] = pairs.groupby("user").cumcount() + 1
+    pairs = pairs[pairs["rank"] <= k]
+    return pd.DataFrame({
+        "user_login": users[pairs["user"].to_numpy()], "rank": pairs["rank"].to_numpy(),
+        "other_login": users[pairs["other"].to_numpy()], "shared_repos": pairs["shared_repos"].to_numpy(),
+        "jaccard": pairs["jaccard"].to_numpy(), "timing": pairs["timing"].to_numpy(), "score": pairs["score"].to_numpy(),
+    })
+
+def create_correlation_tables(conn):
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS repo_similarity (
+            repo_a TEXT,
+            repo_b TEXT,
+            shared_users INTEGER,
+            jaccard REAL,
+            PRIMARY KEY (repo_a, repo_b)
+        );
+        CREATE TABLE IF NOT EXISTS account_similarity (
+            user_login TEXT,
+            rank INTEGER,
+            other_login TEXT,
+            shared_repos INTEGER,
+            jaccard REAL,
+            timing REAL,
+            score REAL,
+            PRIMARY KEY (user_login, rank)
+        );
+        CREATE TABLE IF NOT EXISTS correlation_window (
+            time_start TEXT,
+            time_end TEXT,
+            computed_at TEXT
+        );
+    """)
+
+def store_correlations(conn, repo_pairs, accounts, time_start=TIME_START, time_end=TIME_END):
+    # Each run replaces the previous results; correlation_window records the
+    # PR window they were computed for, so the report can tell if they match
+    create_correlation_tables(conn)
+    with conn:
+        conn.execute("DELETE FROM repo_similarity")
+        conn.execute("DELETE FROM account_similarity")
+        conn.execute("DELETE FROM correlation_window")
+        conn.execute("INSERT INTO correlation_window VALUES (?, ?, ?)",
+                     (time_start, time_end, datetime.now().strftime("%Y-%m-%dT%H:%M:%S")))
+        conn.executemany("INSERT INTO repo_similarity VALUES (?, ?, ?, ?)",
+                         repo_pairs.itertuples(index=False, name=None))
+        conn.executemany("INSERT INTO account_similarity VALUES (?, ?, ?, ?, ?, ?, ?)",
+                         accounts.itertuples(index=False, name=None))
+
+def correlate(conn, time_start=TIME_START, time_end=TIME_END, min_repos=MIN_REPOS, k=TOP_K):
+    incidence, first_pr, users, repos = load_incidence(conn, time_start, time_end)
+    print(f"Incidence matrix: {len(users)} users x {len(repos)} repos, {incidence.nnz} (user, repo) pairs")
+
+    repo_pairs = repo_similarity(incidence, repos)
+    accounts = account_similarity(incidence, first_pr, users, min_repos=min_repos, k=k)
+    store_correlations(conn, repo_pairs, accounts, time_start, time_end)
+    return repo_pairs, accounts
+
+def main():
+    parser = argparse.ArgumentParser(description="Correlate accounts and repos from the PR database")
+    parser.add_argument("--db", default=DB_PATH, help=f"SQLite database (default {DB_PATH})")
+    parser.add_argument("--since", default=TIME_START, help=f"only PRs created from this time (default {TIME_START})")
+    parser.add_argument("--until", default=TIME_END, help=f"only PRs created up to this time (default {TIME_END})")
+    parser.add_argument("--top-k", type=int, default=TOP_K, help=f"similar accounts kept per user (default {TOP_K})")
+    parser.add_argument("--min-repos", type=int, default=MIN_REPOS,
+                        help=f"only correlate accounts with PRs to at least this many repos (default {MIN_REPOS})")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    repo_pairs, accounts = correlate(conn, args.since, args.until, min_repos=args.min_repos, k=args.top_k)
+    conn.close()
+
+    print(f"Stored {len(repo_pairs)} repo pairs and {len(accounts)} account matches "
+          f"for {accounts['user_login'].nunique()} accounts.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+import sqlite3
+import argparse
+import numpy as np
+import pandas as pd
+
+# Configuration
+DB_PATH = "pull_requests_2025.db"
+BURST_WINDOW_HOURS = 6.0  # first PRs to this many hours apart count as one burst
+MIN_BURST_REPOS = 3
+CLUSTER_WINDOW_HOURS = 2.0  # first PRs to a repo this close together line up
+MIN_CLUSTER_REPOS = 2
+
+def create_burst_tables(conn):
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS burst_first_prs (
+            user_login TEXT,
+            repo TEXT,
+            first_pr_at TEXT,
+            PRIMARY KEY (user_login, repo)
+        );
+        CREATE TABLE IF NOT EXISTS account_bursts (
+            user_login TEXT PRIMARY KEY,
+            window_start TEXT,
+            window_end TEXT,
+            repo_count INTEGER,
+            repos TEXT
+        );
+        CREATE TABLE IF NOT EXISTS burst_clusters (
+            cluster_id INTEGER,
+            user_login TEXT,
+            account_count INTEGER,
+            repo_count INTEGER,
+            span_hours REAL,
+            repos TEXT,
+            PRIMARY KEY (cluster_id, user_login)
+        );
+    """)
+
+def sync_first_prs(conn):
+    # Bring burst_first_prs up to date with pull_requests and return the users
+    # whose (repo, first PR) set changed; only they need their bursts redone
+    changed = pd.read_sql_query(
+        """
+        SELECT p.user_login, p.repo, MIN(p.created_at) AS first_pr_at
+        FROM pull_requests p
+        WHERE p.user_login IS NOT NULL
+        GROUP BY p.user_login, p.repo
+        EXCEPT
+        SELECT user_login, repo, first_pr_at FROM burst_first_prs
+        """,
+        conn,
+    )
+    with conn:
+        conn.executemany(
+            """
+            INSERT INTO burst_first_prs (user_login, repo, first_pr_at) VALUES (?, ?, ?)
+            ON CONFLICT(user_login, repo) DO UPDATE SET first_pr_at = excluded.first_pr_at
+            """,
+            changed.itertuples(index=False, name=None),
+        )
+    return changed["user_login"].unique()
+
+def load_first_prs(conn, users=None):
+    if users is None:
+        return pd.read_sql_query("SELECT user_login, repo, first_pr_at FROM burst_first_prs", conn)
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS burst_users (user_login TEXT PRIMARY KEY)")
+    conn.execute("DELETE FROM burst_users")
+    conn.executemany("INSERT INTO burst_users VALUES (?)", ((u,) for u in users))
+    return pd.read_sql_query(
+        "SELECT f.user_login, f.repo, f.first_pr_at FROM burst_first_prs f JOIN burst_users USING (user_login)", conn,
+    )
+
+def to_hours(timestamps):
+    return ((pd.to_datetime(timestamps) - pd.Timestamp(0, tz="UTC")) / pd.Timedelta(hours=1)).to_numpy()
+
+def find_bursts(first_prs, window_hours=BURST_WINDOW_HOURS, min_repos=MIN_BURST_REPOS):
+    # Each (user, repo) appears once, so "distinct repos in a window" is just
+    # the number of rows in it. Sort by (user, time) and sweep: for row i the
+    # window starts at the first row of the same user within window_hours,
+    # found for all rows at once with one searchsorted.
+    if first_prs.empty:
+        return pd.DataFrame(columns=["user_login", "window_start", "window_end", "repo_count", "repos"])
+    user_codes, users = pd.factorize(first_prs["user_login"])
+    hours = to_hours(first_prs["first_pr_at"])
+    hours = hours - hours.min()
+    order = np.lexsort((hours, user_codes))
+    user_codes, hours = user_codes[order], hours[order]
+    repos = first_prs["repo"].to_numpy()[order]
+    first_pr_at = first_prs["first_pr_at"].to_numpy()[order]
+
+    # Offset each user onto its own stretch of the time axis so windows never cross users
+    key = user_codes * (hours.max() + window_hours + 1) + hours
+    start = np.searchsorted(key, key - window_hours, side="left")
+    count = np.arange(len(key)) - start + 1
+
+    # Best window per user: the largest count, earliest on ties
+    best = pd.DataFrame({"user": user_codes, "count": count, "end": np.arange(len(key))})
+    best = best.sort_values(["user", "count", "end"], ascending=[True, False, True]).drop_duplicates("user")
+    best = best[best["count"] >= min_repos]
+    return pd.DataFrame({
+        "user_login": users[best["user"].to_numpy()],
+        "window_start": first_pr_at[best["end"].to_numpy() - best["count"].to_numpy() + 1],
+        "window_end": first_pr_at[best["end"].to_numpy()],
+        "repo_count": best["count"].to_numpy(),
+        "repos": [",".join(sorted(repos[e - c + 1:e + 1])) for e, c in zip(best["end"], best["count"])],
+    }).sort_values(["repo_count", "window_start"], ascending=[False, True], ignore_index=True)
+
+def window_chains(repos, hours, window_hours):
+    # Chain ids for rows sorted by (repo, hours); a chain is measured from its first member
+    chains = np.empty(len(hours), dtype=np.int64)
+    chain, start, current_repo = -1, 0.0, None
+    for i, (repo, hour) in enumerate(zip(repos, hours)):
+        if repo != current_repo or hour - start > window_hours:
+            chain, start, current_repo = chain + 1, hour, repo
+        chains[i] = chain
+    return chains
+
+def find_clusters(first_prs, window_hours=CLUSTER_WINDOW_HOURS, min_repos=MIN_CLUSTER_REPOS):
+    # Per repo, sort first PRs by time and chain each one with those that follow
+    # it within window_hours, then start a new chain, so no chain spans more than
+    # the window. Accounts that share the same chains in at least min_repos repos
+    # form a cluster. Sorting dominates: O(n log n).
+    columns = ["cluster_id", "user_login", "account_count", "repo_count", "span_hours", "repos"]
+    if first_prs.empty:
+        return pd.DataFrame(columns=columns)
+    df = first_prs.assign(hours=to_hours(first_prs["first_pr_at"])).sort_values(["repo", "hours"], ignore_index=True)
+    df["chain"] = window_chains(df["repo"].to_numpy(), df["hours"].to_numpy(), window_hours)
+    df = df[df.groupby("chain")["chain"].transform("size") >= 2]
+    if df.empty:
+        return pd.DataFrame(columns=columns)
+
+    # An account's signature is the set of chains it belongs to, hashed as a
+    # sum of random 64-bit tags per chain so it groups without string keys;
+    # the span is the widest spread of first PRs within any of those chains
+    chain_hours = df.groupby("chain")["hours"]
+    df["span_hours"] = df["chain"].map(chain_hours.max() - chain_hours.min())
+    tags = np.random.default_rng(0).integers(0, 2**63, size=df["chain"].max() + 1, dtype=np.uint64)
+    df["tag"] = tags[df["chain"].to_numpy()]
+    signatures = df.groupby("user_login").agg(
+        signature=("tag", "sum"), repo_count=("repo", "size"), span_hours=("span_hours", "max"),
+    )
+    signatures = signatures[signatures["repo_count"] >= min_repos]
+    signatures["account_count"] = signatures.groupby(["signature", "repo_count"])["repo_count"].transform("size")
+    signatures = signatures[signatures["account_count"] >= 2].reset_index()
+    if signatures.empty:
+        return pd.DataFrame(columns=columns)
+    members = df[df["user_login"].isin(signatures["user_login"])]
+    signatures["repos"] = signatures["user_login"].map(members.groupby("user_login")["repo"].agg(lambda r: ",".join(sorted(r))))
+
+    # Rank: more accounts x more repos first, then tighter spans
+    clusters = signatures.groupby(["signature", "repo_count"], as_index=False).agg(
+        account_count=("account_count", "first"), span_hours=("span_hours", "first"),
+    )
+    clusters["size"] = clusters["account_count"] * clusters["repo_count"]
+    clusters = clusters.sort_values(["size", "span_hours"], ascending=[False, True])
+    clusters["cluster_id"] = np.arange(1, len(clusters) + 1)
+    signatures = signatures.merge(clusters[["signature", "repo_count", "cluster_id"]], on=["signature", "repo_count"])
+    return signatures.sort_values(["cluster_id", "user_login"])[columns]
+
+def store_bursts(conn, bursts, users=None):
+    # users=None replaces everything, otherwise only those users' rows
+    with conn:
+        if users is None:
+            conn.execute("DELETE FROM account_bursts")
+        else:
+            conn.executemany("DELETE FROM account_bursts WHERE user_login = ?", ((u,) for u in users))
+        conn.executemany("INSERT INTO account_bursts VALUES (?, ?, ?, ?, ?)", bursts.itertuples(index=False, name=None))
+
+def store_clusters(conn, clusters):
+    with conn:
+        conn.execute("DELETE FROM burst_clusters")
+        conn.executemany("INSERT INTO burst_clusters VALUES (?, ?, ?, ?, ?, ?)", clusters.itertuples(index=False, name=None))
+
+def update_bursts(conn, full=False):
+    # Incremental by default: only users with new or earlier first PRs are re-swept
+    create_burst_tables(conn)
+    if full:
+        with conn:
+            conn.execute("DELETE FROM burst_first_prs")
+    touched = sync_first_prs(conn)
+    if full:
+        store_bursts(conn, find_bursts(load_first_prs(conn)))
+    elif len(touched):
+        store_bursts(conn, find_bursts(load_first_prs(conn, touched)), touched)
+    clusters = find_clusters(load_first_prs(conn))
+    store_clusters(conn, clusters)
+    return touched, clusters
+
+def print_summary(conn, touched, clusters, top=10):
+    print(f"{len(touched)} accounts with new first PRs re-checked.")
+    bursts = pd.read_sql_query(
+        "SELECT * FROM account_bursts ORDER BY repo_count DESC, window_start LIMIT ?", conn, params=(top,),
+    )
+    total = conn.execute("SELECT COUNT(*) FROM account_bursts").fetchone()[0]
+    print(f"{total} accounts opened first PRs in {MIN_BURST_REPOS}+ repos within {BURST_WINDOW_HOURS:g}h:")
+    for row in bursts.itertuples():
+        print(f"  {row.user_login}: {row.repo_count} repos {row.window_start} -> {row.window_end}")
+    ranked = clusters.drop_duplicates("cluster_id").head(top)
+    print(f"{clusters['cluster_id'].nunique()} clusters of accounts with lined-up first PRs:")
+    for row in ranked.itertuples():
+        members = clusters.loc[clusters["cluster_id"] == row.cluster_id, "user_login"]
+        print(f"  #{row.cluster_id}: {row.account_count} accounts x {row.repo_count} repos "
+              f"within {row.span_hours:.1f}h ({', '.join(members[:5])}{', ...' if len(members) > 5 else ''})")
+
+def main():
+    parser = argparse.ArgumentParser(description="Flag PR bursts and clusters of accounts with lined-up first PRs")
+    parser.add_argument("--db", default=DB_PATH, help=f"SQLite database (default {DB_PATH})")
+    parser.add_argument("--full", action="store_true", help="recompute every account instead of only those with new PRs")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    touched, clusters = update_bursts(conn, full=args.full)
+    print_summary(conn, touched, clusters)
+    conn.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+import os
+import sqlite3
+import argparse
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from tqdm import tqdm
+import fetch_prs_to_sqlite_2025only as fetcher
+
+# Configuration
+DB_PATH = "pull_requests_2025.db"
+PARQUET_DIR = "parquet"
+COMPRESSION = "zstd"
+# Low-cardinality strings; titles are mostly unique and stay plain
+DICTIONARY_COLUMNS = ["repo", "state", "user_login", "head_ref", "head_repo_full_name", "issue_title"]
+
+# Times are naive UTC timestamps (GitHub only sends UTC)
+PR_SCHEMA = pa.schema([
+    ("id", pa.int64()),
+    ("repo", pa.string()),
+    ("number", pa.int64()),
+    ("title", pa.string()),
+    ("state", pa.string()),
+    ("created_at", pa.timestamp("ms")),
+    ("updated_at", pa.timestamp("ms")),
+    ("closed_at", pa.timestamp("ms")),
+    ("merged_at", pa.timestamp("ms")),
+    ("user_login", pa.string()),
+    ("user_id", pa.int64()),
+    ("head_ref", pa.string()),
+    ("head_repo_full_name", pa.string()),
+])
+ISSUE_SCHEMA = pa.schema([
+    ("pr_id", pa.int64()),
+    ("issue_number", pa.int64()),
+    ("issue_title", pa.string()),
+])
+TIME_COLUMNS = ["created_at", "updated_at", "closed_at", "merged_at"]
+
+def partition_dir(parquet_dir, table, repo, month):
+    # Hive-style names for other tools; repo is also a column inside the file
+    return os.path.join(parquet_dir, table, f"repo={repo.replace('/', '__')}", f"month={month}")
+
+def month_bounds(month):
+    start = pd.Timestamp(f"{month}-01")
+    end = start + pd.offsets.MonthBegin(1)
+    return start.strftime("%Y-%m-%dT%H:%M:%SZ"), end.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+def to_table(df, schema):
+    for column in TIME_COLUMNS:
+        if column in df:
+            df[column] = pd.to_datetime(df[column], utc=True).dt.tz_localize(None)
+    return pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+
+def write_partition(path, table, schema):
+    # Write next to the old file and swap, so readers never see half a partition
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp"
+    pq.write_table(table, tmp, compression=COMPRESSION,
+                   use_dictionary=[c for c in DICTIONARY_COLUMNS if c in schema.names])
+    os.replace(tmp, path)
+
+def export_partition(conn, parquet_dir, repo, month):
+    start, end = month_bounds(month)
+    prs = pd.read_sql_query(
+        "SELECT * FROM pull_requests WHERE repo = ? AND created_at >= ? AND created_at < ? ORDER BY created_at, id",
+        conn, params=(repo, start, end),
+    )
+    issues = pd.read_sql_query(
+        """
+        SELECT i.pr_id, i.issue_number, i.issue_title
+        FROM pr_issues i JOIN pull_requests p ON p.id = i.pr_id
+        WHERE p.repo = ? AND p.created_at >= ? AND p.created_at < ?
+        ORDER BY i.pr_id, i.issue_number
+        """,
+        conn, params=(repo, start, end),
+    )
+    for table, df, schema in (("pull_requests", prs, PR_SCHEMA), ("pr_issues", issues, ISSUE_SCHEMA)):
+        path = os.path.join(partition_dir(parquet_dir, table, repo, month), "part-0.parquet")
+        if df.empty:
+            if os.path.exists(path):
+                os.remove(path)
+            continue
+        write_partition(path, to_table(df[schema.names], schema), schema)
+    return len(prs)
+
+def export_parquet(conn, parquet_dir=PARQUET_DIR, full=False):
+    # Rewrites only the (repo, month) partitions the fetcher marked in export_dirty
+    # since the last export; --full rewrites every partition
+    fetcher.create_db_schema(conn)  # older DBs get export_dirty, seeded with every partition
+    if full:
+        with conn:
+            conn.execute("""
+                INSERT OR IGNORE INTO export_dirty (repo, month)
+                SELECT DISTINCT repo, substr(created_at, 1, 7) FROM pull_requests
+            """)
+    dirty = conn.execute("SELECT repo, month, version FROM export_dirty ORDER BY repo, month").fetchall()
+    rows = 0
+    for repo, month, version in tqdm(dirty, desc="Exporting partitions", unit="partition", disable=not dirty):
+        rows += export_partition(conn, parquet_dir, repo, month)
+        # A write since the read bumped version; leave that partition for next time
+        with conn:
+            conn.execute("DELETE FROM export_dirty WHERE repo = ? AND month = ? AND version = ?", (repo, month, version))
+    return len(dirty), rows
+
+def main():
+    parser = argparse.ArgumentParser(description="Export pull_requests and pr_issues to Parquet partitioned by repo and month")
+    parser.add_argument("--db", default=DB_PATH, help=f"SQLite database (default {DB_PATH})")
+    parser.add_argument("--output", default=PARQUET_DIR, help=f"Parquet directory (default {PARQUET_DIR})")
+    parser.add_argument("--full", action="store_true", help="rewrite every partition, not only the changed ones")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    partitions, rows = export_parquet(conn, args.output, full=args.full)
+    conn.close()
+    print(f"Exported {partitions} partitions ({rows} PRs) to {args.output}/")
+
+if __name__ == "__main__":
+    main()
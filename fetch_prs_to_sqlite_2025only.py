@@ -3,26 +3,34 @@ import sqlite3
 import time
 import os
 import re
+import csv
 import logging
-import pandas as pd
-from dotenv import load_dotenv
+import logging.handlers
+import sys
+import cProfile
+import pstats
+import io
 from tqdm import tqdm
-from datetime import datetime
+from datetime import datetime, timezone
+from collections import defaultdict
+from contextlib import contextmanager
+from dataclasses import dataclass, replace
 import json
-
-load_dotenv()
-
-GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
-if not GITHUB_TOKEN:
-    raise Exception("GitHub token not found. Set GITHUB_TOKEN in .env or environment.")
-
-HEADERS_oldddddd = {
-    "Authorization": f"token {GITHUB_TOKEN}",
-    "Accept": "application/vnd.github+json"
-}
+import gzip
+import zlib
+import random
+import argparse
+import queue
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from urllib.parse import urlencode
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+# Importing this module has no side effects: the token is checked, the session
+# authenticated and the log files opened by start_run(), once per run
 
 HEADERS = {
-    "Authorization": f"token {GITHUB_TOKEN}",
     "Accept": "application/vnd.github.v3+json"
 }
 
@@ -30,145 +38,373 @@ DB_FILE = "pull_requests_2025.db"
 TIME_START = "2025-04-14T00:00:00Z"
 TIME_END = "2025-05-21T23:59:59Z"
 REPO_FILE = "repos.csv"
-CALL_COUNT = 0
-
-# Setup log files per run
-timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-status_log_filename = f"status_log_{timestamp}.txt"
-data_log_filename = f"data_log_{timestamp}.txt"
-
-# Status logger (INFO, WARNINGS, STATE)
+RATE_LIMIT_RESERVE = 50  # requests left untouched in each window
+PACING_THRESHOLD = 0.2  # full speed until this share of the window's quota is left
+MAX_RETRIES = 5
+BACKOFF_BASE = 2.0
+BACKOFF_MAX = 300
+WRITE_CHUNK_SIZE = 1000
+DB_CACHE_MB = 64
+HTTP_CACHE_FILE = "http_cache.db"
+HTTP_CACHE_MAX_MB = 512  # HTTP_CACHE_MAX_MB in the environment overrides it
+HTTP_CACHE = None  # ResponseCache, opened in main()
+ARCHIVE_DIR = "archive"
+ARCHIVE_SEGMENT_MB = 64
+ARCHIVE = None  # PageArchive, opened in main()
+# Point at a GitHub Enterprise host or a local mock (mock_github.py) with
+# GITHUB_API_URL; read by configure_session() so a value in .env counts
+DEFAULT_API_URL = "https://api.github.com"
+GITHUB_API_URL = DEFAULT_API_URL
+GRAPHQL_URL = f"{GITHUB_API_URL}/graphql"
+ISSUE_BATCH_SIZE = 100
+GRAPHQL_INT_MAX = 2**31 - 1  # GraphQL Int is 32-bit; a larger "#N" fails the whole query
+GRAPHQL_PAGE_SIZE = 100
+MAX_WORKERS = 4  # MAX_WORKERS in the environment overrides it
+SHARD_DIR = "shards"  # shards/shard-NN/ holds one shard's DB, caches and logs
+HTTP_LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)  # seconds
+
+# Pooled HTTP session shared by all fetch workers
+SESSION = requests.Session()
+SESSION.headers.update(HEADERS)
+
+# Status logger (INFO, WARNINGS, STATE) and data logger (everything inserted
+# into DB). Both get their handlers from start_run(); until then nothing is
+# written and the data log lines are not even built.
 status_formatter = logging.Formatter("%(asctime)s [%(levelname)s] %(message)s")
-status_handler = logging.FileHandler(status_log_filename)
-status_handler.setFormatter(status_formatter)
-status_handler.setLevel(logging.INFO)
-
-console_handler = logging.StreamHandler()
-console_handler.setFormatter(status_formatter)
-console_handler.setLevel(logging.WARNING)
-
 logger = logging.getLogger("status_logger")
 logger.setLevel(logging.INFO)
-logger.addHandler(status_handler)
-logger.addHandler(console_handler)
 
-# Data logger (everything inserted into DB)
 data_logger = logging.getLogger("data_logger")
 data_logger.setLevel(logging.INFO)
-data_log_handler = logging.FileHandler(data_log_filename)
-data_log_handler.setFormatter(logging.Formatter("%(message)s"))
-data_logger.addHandler(data_log_handler)
+data_logger.propagate = False
+data_log_listener = None
+
+def setup_logging(run_id, log_dir=".", data_log=True):
+    # Data log records go through a queue and a listener thread writes them,
+    # so the DB writer never waits on log file I/O
+    global data_log_listener
+    close_logging()
+    status_handler = logging.FileHandler(os.path.join(log_dir, f"status_log_{run_id}.txt"))
+    status_handler.setFormatter(status_formatter)
+    status_handler.setLevel(logging.INFO)
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(status_formatter)
+    console_handler.setLevel(logging.WARNING)
+    logger.addHandler(status_handler)
+    logger.addHandler(console_handler)
+
+    if data_log:
+        data_log_handler = logging.FileHandler(os.path.join(log_dir, f"data_log_{run_id}.txt"), delay=True)
+        data_log_handler.setFormatter(logging.Formatter("%(message)s"))
+        data_log_queue = queue.SimpleQueue()
+        data_logger.addHandler(logging.handlers.QueueHandler(data_log_queue))
+        data_log_listener = logging.handlers.QueueListener(data_log_queue, data_log_handler)
+        data_log_listener.start()
+
+def close_logging():
+    # Flushes what is still queued and closes this run's files
+    global data_log_listener
+    if data_log_listener is not None:
+        data_log_listener.stop()
+        for handler in data_log_listener.handlers:
+            handler.close()
+        data_log_listener = None
+    for log in (logger, data_logger):
+        for handler in list(log.handlers):
+            log.removeHandler(handler)
+            handler.close()
+
+def data_log_enabled():
+    return data_logger.hasHandlers() and not data_logger.disabled
 
 def extract_linked_issues(pr_body):
     issue_refs = re.findall(r'#(\d+)', pr_body or '')
     return list(set(int(num) for num in issue_refs))
 
-def fetch_issue_title(repo, issue_number):
+ISSUE_TITLE_QUERY = """
+query($owner: String!, $name: String!) {
+  repository(owner: $owner, name: $name) {
+%s
+  }
+}
+"""
+
+def fetch_issue_titles(repo, issue_numbers):
+    # One GraphQL call resolves up to ISSUE_BATCH_SIZE refs via aliased
+    # issueOrPullRequest fields (a "#N" can point at an issue or a PR, like /issues/N).
+    # Returns {number: title}, with None for numbers that do not exist in the repo.
+    # Aliases that came back null for any other reason (timeouts, permissions) are
+    # left out so they stay pending and a later run retries them.
+    # Returns None when GitHub rejected the query as a whole (no data at all).
     owner, name = repo.split("/")
-    url = f"https://api.github.com/repos/{owner}/{name}/issues/{issue_number}"
-    response = github_get(url)
+    fields = "\n".join(
+        f"    i{num}: issueOrPullRequest(number: {num}) {{ ... on Issue {{ title }} ... on PullRequest {{ title }} }}"
+        for num in issue_numbers
+    )
+    response = github_graphql(ISSUE_TITLE_QUERY % fields, {"owner": owner, "name": name})
     if response.status_code != 200:
+        logger.warning(f"Issue title lookup failed for {repo}: {response.status_code}")
+        return {}
+    body = response.json()
+    if body.get("data") is None:
+        logger.warning(f"Issue title query rejected for {repo}: {body.get('errors')}")
         return None
-    return response.json().get("title")
-
-
-
-def fetch_all_prs(repo):
+    repository = body["data"].get("repository")
+    if repository is None:
+        logger.warning(f"Issue title lookup returned no repository for {repo}")
+        return {}
+    # GraphQL errors carry the alias as path[1], e.g. ["repository", "i123"]
+    error_types = {error["path"][1]: error.get("type") for error in body.get("errors") or []
+                   if len(error.get("path") or []) > 1}
+    resolved = {alias: node for alias, node in repository.items()
+                if node is not None or error_types.get(alias) == "NOT_FOUND"}
+    if len(resolved) < len(repository):
+        logger.warning(f"Issue title lookup left {len(repository) - len(resolved)} refs unresolved for {repo}")
+    # Only resolved aliases are archived, so a replay does not cache the failures either
+    archive_page(repo, "graphql_issue_titles", f"{issue_numbers[0]}-{issue_numbers[-1]}", resolved, response)
+    return {int(alias[1:]): (node or {}).get("title") for alias, node in resolved.items()}
+
+def in_window(pr, time_start, time_end):
+    return time_start <= pr["created_at"] <= time_end
+
+def print_page_summary(repo, pages, pages_used, pr_count):
+    print(f"  {repo}: {pages_used}/{pages} pages used, {pr_count} PRs in window")
+    logger.info(f"{repo}: fetched {pages} pages, {pages_used} had PRs in window, kept {pr_count} PRs")
+
+def fetch_all_prs(repo, time_start=None, time_end=None, start_page=1, on_page=None):
+    # /pulls ignores "since", so the window is enforced here: pages come newest
+    # first, PRs after time_end are skipped and paging stops on the first page
+    # that reaches back past time_start. on_page(prs, next_page) is called after
+    # every page so the caller can checkpoint it.
+    time_start = time_start or TIME_START
+    time_end = time_end or TIME_END
     owner, name = repo.split("/")
     pr_list = []
-    page = 1
+    page = start_page
+    pages_used = 0
     pbar = tqdm(desc=f"Fetching {repo}", unit="page")
 
     while True:
-        url = f"https://api.github.com/repos/{owner}/{name}/pulls"
+        url = f"{GITHUB_API_URL}/repos/{owner}/{name}/pulls"
         params = {
             "state": "all",
             "per_page": 100,
             "page": page,
             "sort": "created",
             "direction": "desc",
-            "since": "2025-01-01T00:00:00Z",
         }
         response = github_get(url, params=params)
         pbar.update(1)
 
         if response.status_code != 200:
-            print(f"Failed to fetch PRs for {repo}: {response.status_code}")
-            break
+            raise RuntimeError(f"Failed to fetch PRs for {repo} (page {page}): {response.status_code}")
 
+        parse_started = time.perf_counter()
         data = response.json()
+        in_range = [pr for pr in data if in_window(pr, time_start, time_end)]
+        pages_used += bool(in_range)
+        page_prs = [pr for pr in in_range if pr.get("user", {}).get("type") != "Bot"]
+        pr_list.extend(page_prs)
+        METRICS.add(repo, "parse", time.perf_counter() - parse_started)
+        archive_page(repo, "rest_pulls", page, data, response)
         if not data:
             break
+        if on_page:
+            on_page(page_prs, page + 1)
 
-        filtered = [pr for pr in data if pr.get("user", {}).get("type") != "Bot" and pr["created_at"] >= "2025-01-01T00:00:00Z"]
-        pr_list.extend(filtered)
-
-        if len(data) < 100:
+        if len(data) < 100 or data[-1]["created_at"] < time_start:
             break
 
         page += 1
-        time.sleep(0.5)
 
     pbar.close()
+    print_page_summary(repo, page - start_page + 1, pages_used, len(pr_list))
     return pr_list
 
 
 
 
-def fetch_incremental_prs(repo, since):
-    validate_tail_count = 25  # Number of recent PRs to refetch and validate
+PULL_REQUESTS_QUERY = """
+query($owner: String!, $name: String!, $cursor: String, $pageSize: Int!) {
+  repository(owner: $owner, name: $name) {
+    pullRequests(first: $pageSize, after: $cursor, orderBy: {field: CREATED_AT, direction: DESC}) {
+      pageInfo { hasNextPage endCursor }
+      nodes {
+        databaseId
+        number
+        title
+        state
+        createdAt
+        updatedAt
+        closedAt
+        mergedAt
+        body
+        headRefName
+        headRepository { nameWithOwner }
+        author {
+          __typename
+          login
+          ... on User { databaseId }
+          ... on Bot { databaseId }
+        }
+        closingIssuesReferences(first: 25) {
+          nodes { number title repository { nameWithOwner } }
+        }
+      }
+    }
+  }
+}
+"""
+
+def graphql_pr_to_rest(repo, node):
+    # Reshape a GraphQL PR node into the REST /pulls fields insert_prs reads
+    author = node.get("author") or {"__typename": "User", "login": "ghost"}
+    head_repo = node.get("headRepository")
+    return {
+        "id": node["databaseId"],
+        "number": node["number"],
+        "title": node["title"],
+        "state": "open" if node["state"] == "OPEN" else "closed",
+        "created_at": node["createdAt"],
+        "updated_at": node["updatedAt"],
+        "closed_at": node["closedAt"],
+        "merged_at": node["mergedAt"],
+        "body": node.get("body"),
+        "user": {
+            "login": author.get("login"),
+            "id": author.get("databaseId"),
+            "type": "Bot" if author["__typename"] == "Bot" else "User",
+        },
+        "head": {
+            "ref": node["headRefName"],
+            "repo": {"full_name": head_repo["nameWithOwner"]} if head_repo else None,
+        },
+        # Issues this PR closes, already titled; same-repo only like the #N refs
+        "__closing_issues": {
+            issue["number"]: issue["title"]
+            for issue in node["closingIssuesReferences"]["nodes"]
+            if issue["repository"]["nameWithOwner"].lower() == repo.lower()
+        },
+    }
+
+def fetch_all_prs_graphql(repo, time_start=None, time_end=None, start_page=None, on_page=None):
+    # Same result as fetch_all_prs, but one query per GRAPHQL_PAGE_SIZE PRs also
+    # carries authors and closing issues with titles. The connection cannot filter
+    # on createdAt, so it is read newest first and stops once past time_start.
+    time_start = time_start or TIME_START
+    time_end = time_end or TIME_END
     owner, name = repo.split("/")
     pr_list = []
-    page = 1
-    pbar = tqdm(desc=f"Incremental {repo}", unit="page")
+    cursor = start_page
+    pages = 0
+    pages_used = 0
+    pbar = tqdm(desc=f"Fetching {repo} (GraphQL)", unit="page")
+
+    while True:
+        response = github_graphql(PULL_REQUESTS_QUERY, {
+            "owner": owner, "name": name, "cursor": cursor, "pageSize": GRAPHQL_PAGE_SIZE,
+        })
+        pbar.update(1)
+        pages += 1
+
+        if response.status_code != 200:
+            raise RuntimeError(f"Failed to fetch PRs for {repo}: {response.status_code}")
+        parse_started = time.perf_counter()
+        repository = (response.json().get("data") or {}).get("repository")
+        if repository is None:
+            raise RuntimeError(f"Failed to fetch PRs for {repo}: {response.json().get('errors')}")
+
+        connection = repository["pullRequests"]
+        reached_start = False
+        page_prs = []
+        page_used = False
+        for node in connection["nodes"]:
+            if node["createdAt"] < time_start:
+                reached_start = True
+                break
+            if node["createdAt"] > time_end:
+                continue
+            page_used = True
+            pr = graphql_pr_to_rest(repo, node)
+            if pr["user"]["type"] != "Bot":
+                page_prs.append(pr)
+        pages_used += page_used
+        pr_list.extend(page_prs)
+        METRICS.add(repo, "parse", time.perf_counter() - parse_started)
+        archive_page(repo, "graphql_pulls", pages, connection, response)
+        if on_page:
+            on_page(page_prs, connection["pageInfo"]["endCursor"])
+
+        if reached_start or not connection["pageInfo"]["hasNextPage"]:
+            break
+        cursor = connection["pageInfo"]["endCursor"]
+
+    pbar.close()
+    print_page_summary(repo, pages, pages_used, len(pr_list))
+    return pr_list
+
+FETCH_BACKENDS = {
+    "rest": fetch_all_prs,
+    "graphql": fetch_all_prs_graphql,
+}
 
-    validate_batch = []
-    found_cutoff = False
+
+def fetch_incremental_prs(repo, since, last_number=None, time_start=None, time_end=None,
+                          start_page=1, newest_updated=None, on_page=None):
+    # Walks /pulls newest-updated first and stops at the first PR not updated
+    # since the watermark, so the cost follows activity, not repo history.
+    # Returns the changed PRs and the newest updated_at seen (the next watermark).
+    # on_page(prs, next_page, newest_updated) is called after every page.
+    time_start = time_start or TIME_START
+    time_end = time_end or TIME_END
+    owner, name = repo.split("/")
+    pr_list = []
+    newest_updated = max(newest_updated or since, since)
+    page = start_page
+    pbar = tqdm(desc=f"Syncing {repo}", unit="page")
 
     while True:
-        url = f"https://api.github.com/repos/{owner}/{name}/pulls"
+        url = f"{GITHUB_API_URL}/repos/{owner}/{name}/pulls"
         params = {
             "state": "all",
             "per_page": 100,
             "page": page,
-            "sort": "created",
-            "direction": "desc"
+            "sort": "updated",
+            "direction": "desc",
         }
         response = github_get(url, params=params)
         pbar.update(1)
 
         if response.status_code != 200:
-            print(f"Failed to fetch PRs for {repo}: {response.status_code}")
-            break
+            raise RuntimeError(f"Failed to fetch PRs for {repo} (page {page}): {response.status_code}")
 
+        parse_started = time.perf_counter()
         data = response.json()
+        reached_watermark = False
+        page_prs = []
+        for pr in data:
+            if pr["updated_at"] <= since:
+                reached_watermark = True
+                break
+            newest_updated = max(newest_updated, pr["updated_at"])
+            if pr.get("user", {}).get("type") == "Bot" or not in_window(pr, time_start, time_end):
+                continue
+            pr["__validation_type"] = "new" if last_number is None or pr["number"] > last_number else "updated"
+            page_prs.append(pr)
+        pr_list.extend(page_prs)
+        METRICS.add(repo, "parse", time.perf_counter() - parse_started)
+        archive_page(repo, "rest_pulls_updated", page, data, response)
         if not data:
             break
+        if on_page:
+            on_page(page_prs, page + 1, newest_updated)
 
-        filtered = [pr for pr in data if pr.get("user", {}).get("type") != "Bot"]
-        new_prs = []
-        for pr in filtered:
-            if len(validate_batch) < validate_tail_count:
-                pr["__validation_type"] = "validate"
-                validate_batch.append(pr)
-            if pr["created_at"] > since:
-                pr["__validation_type"] = "new"
-                new_prs.append(pr)
-            elif not found_cutoff:
-                found_cutoff = True
-                break
-
-        pr_list.extend(new_prs)
-        if len(new_prs) < len(data):
+        if reached_watermark or len(data) < 100:
             break
         page += 1
-        time.sleep(0.5)
 
     pbar.close()
-    for pr in validate_batch:
-        if pr not in pr_list:
-            pr_list.append(pr)
-    return pr_list
+    return pr_list, newest_updated
 
 
 
@@ -199,177 +435,1356 @@ def create_db_schema(conn):
             FOREIGN KEY(pr_id) REFERENCES pull_requests(id)
         )
     """)
+    c.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'issue_titles'")
+    seed_issue_cache = c.fetchone() is None
+    # Persistent title cache; issue_title is NULL when the number does not resolve
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS issue_titles (
+            repo TEXT,
+            issue_number INTEGER,
+            issue_title TEXT,
+            fetched_at TEXT,
+            PRIMARY KEY (repo, issue_number)
+        )
+    """)
+    # Per-repo incremental sync watermark
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS sync_state (
+            repo TEXT PRIMARY KEY,
+            last_updated_at TEXT,
+            last_pr_number INTEGER,
+            last_synced_at TEXT
+        )
+    """)
+    if seed_issue_cache:
+        # Titles already stored in pr_issues never need to be fetched again
+        c.execute("""
+            INSERT OR IGNORE INTO issue_titles (repo, issue_number, issue_title)
+            SELECT p.repo, i.issue_number, i.issue_title
+            FROM pr_issues i JOIN pull_requests p ON p.id = i.pr_id
+            WHERE i.issue_title IS NOT NULL
+        """)
     conn.commit()
+    migrate_db_schema(conn)
+
+def dedupe_pr_issues(conn):
+    # Re-scrapes used to add the same link again; keep the first row of each pair
+    conn.execute("""
+        DELETE FROM pr_issues
+        WHERE rowid NOT IN (SELECT MIN(rowid) FROM pr_issues GROUP BY pr_id, issue_number)
+    """)
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_pr_issues_pr_issue ON pr_issues(pr_id, issue_number)")
+
+def add_sync_cursors(conn):
+    # Page-level resume state lives next to the watermark it leads to
+    for column in ("mode TEXT", "next_page TEXT", "pending_updated_at TEXT", "status TEXT",
+                   "pages_done INTEGER DEFAULT 0"):
+        conn.execute(f"ALTER TABLE sync_state ADD COLUMN {column}")
+    conn.execute("UPDATE sync_state SET status = 'done' WHERE last_updated_at IS NOT NULL")
+
+def add_report_indexes(conn):
+    # Match the report and summary lookups: by repo, by user and repo, by date
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_pull_requests_repo_created ON pull_requests(repo, created_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_pull_requests_user_repo_created ON pull_requests(user_login, repo, created_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_pull_requests_created ON pull_requests(created_at)")
+
+def add_summary_tables(conn):
+    # Small pre-aggregated tables the report reads instead of pull_requests.
+    # user_repo_daily is kept per day so MIN(first_pr_at) gives the per-(user, repo)
+    # first PR time for any report window, not just the collection window.
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS user_repo_daily (
+            user_login TEXT,
+            repo TEXT,
+            day TEXT,
+            pr_count INTEGER,
+            open_count INTEGER,
+            first_pr_at TEXT,
+            PRIMARY KEY (user_login, repo, day)
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS repo_daily_counts (
+            repo TEXT,
+            day TEXT,
+            pr_count INTEGER,
+            linked_count INTEGER,
+            PRIMARY KEY (repo, day)
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS pr_linked (
+            pr_id INTEGER PRIMARY KEY,
+            has_linked_issue INTEGER
+        )
+    """)
+    # export_dirty does not exist yet; add_export_tracking marks every partition anyway
+    refresh_summaries(conn, "SELECT id FROM pull_requests", mark_export=False)
+
+def add_export_tracking(conn):
+    # (repo, month) partitions export_parquet.py has to rewrite; version changes
+    # on every write so an export only clears what it actually saw.
+    # Everything already stored still has to be exported once.
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS export_dirty (
+            repo TEXT,
+            month TEXT,
+            version INTEGER DEFAULT 0,
+            PRIMARY KEY (repo, month)
+        )
+    """)
+    conn.execute("""
+        INSERT OR IGNORE INTO export_dirty (repo, month)
+        SELECT DISTINCT repo, substr(created_at, 1, 7) FROM pull_requests
+    """)
+
+def add_sync_window(conn):
+    # The created_at window a repo's watermark covers, and the window of the pass in
+    # progress. Older rows know none, so their next run does one full pass.
+    for column in ("window_start TEXT", "window_end TEXT", "pending_window_start TEXT", "pending_window_end TEXT"):
+        conn.execute(f"ALTER TABLE sync_state ADD COLUMN {column}")
+
+# Applied in order to existing DBs; PRAGMA user_version records how many have run
+SCHEMA_MIGRATIONS = [
+    dedupe_pr_issues,
+    add_sync_cursors,
+    add_report_indexes,
+    add_summary_tables,
+    add_export_tracking,
+    add_sync_window,
+]
+
+def migrate_db_schema(conn):
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    for idx, migration in enumerate(SCHEMA_MIGRATIONS[version:], start=version + 1):
+        logger.info(f"Applying DB migration {idx}: {migration.__name__}")
+        migration(conn)
+        conn.execute(f"PRAGMA user_version = {idx}")
+        conn.commit()
+
+def refresh_summaries(conn, touched_sql, params=(), mark_export=True):
+    # Recomputes the summary rows for every (user, repo, day) and (repo, day) that
+    # a PR selected by touched_sql falls into, so upserts never double count.
+    # Runs inside the caller's transaction.
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS touched_prs (id INTEGER PRIMARY KEY)")
+    conn.execute("DELETE FROM touched_prs")
+    conn.execute(f"INSERT OR IGNORE INTO touched_prs (id) {touched_sql}", params)
+    conn.execute("""
+        INSERT OR REPLACE INTO pr_linked (pr_id, has_linked_issue)
+        SELECT t.id, EXISTS (SELECT 1 FROM pr_issues i WHERE i.pr_id = t.id AND i.issue_title IS NOT NULL)
+        FROM touched_prs t
+    """)
+    conn.execute("DROP TABLE IF EXISTS temp.touched_days")
+    conn.execute("""
+        CREATE TEMP TABLE touched_days AS
+        SELECT DISTINCT p.user_login, p.repo, substr(p.created_at, 1, 10) AS day
+        FROM touched_prs t JOIN pull_requests p ON p.id = t.id
+    """)
+    if mark_export:
+        conn.execute("""
+            INSERT INTO export_dirty (repo, month)
+            SELECT DISTINCT repo, substr(day, 1, 7) FROM touched_days WHERE true
+            ON CONFLICT(repo, month) DO UPDATE SET version = version + 1
+        """)
+    conn.execute("""
+        DELETE FROM user_repo_daily
+        WHERE (user_login, repo, day) IN (SELECT user_login, repo, day FROM touched_days)
+    """)
+    conn.execute("""
+        INSERT INTO user_repo_daily (user_login, repo, day, pr_count, open_count, first_pr_at)
+        SELECT p.user_login, p.repo, k.day, COUNT(*), SUM(p.state = 'open'), MIN(p.created_at)
+        FROM touched_days k JOIN pull_requests p
+          ON p.user_login = k.user_login AND p.repo = k.repo
+         AND p.created_at BETWEEN k.day || 'T00:00:00Z' AND k.day || 'T23:59:59Z'
+        GROUP BY p.user_login, p.repo, k.day
+    """)
+    conn.execute("""
+        DELETE FROM repo_daily_counts
+        WHERE (repo, day) IN (SELECT DISTINCT repo, day FROM touched_days)
+    """)
+    conn.execute("""
+        INSERT INTO repo_daily_counts (repo, day, pr_count, linked_count)
+        SELECT p.repo, k.day, COUNT(*), SUM(COALESCE(l.has_linked_issue, 0))
+        FROM (SELECT DISTINCT repo, day FROM touched_days) k JOIN pull_requests p
+          ON p.repo = k.repo AND p.created_at BETWEEN k.day || 'T00:00:00Z' AND k.day || 'T23:59:59Z'
+        LEFT JOIN pr_linked l ON l.pr_id = p.id
+        GROUP BY p.repo, k.day
+    """)
+
+def connect_db(db_file):
+    conn = sqlite3.connect(db_file)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA cache_size=-{DB_CACHE_MB * 1024}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    return conn
+
+def configure_session(workers, token=None, api_url=None):
+    global GITHUB_API_URL, GRAPHQL_URL
+    token = token or os.getenv("GITHUB_TOKEN")
+    if not token:
+        raise Exception("GitHub token not found. Set GITHUB_TOKEN in .env or environment.")
+    SESSION.headers["Authorization"] = f"token {token}"
+    GITHUB_API_URL = (api_url or os.getenv("GITHUB_API_URL") or DEFAULT_API_URL).rstrip("/")
+    GRAPHQL_URL = f"{GITHUB_API_URL}/graphql"
+    adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers * 2)
+    SESSION.mount("https://", adapter)
+    SESSION.mount("http://", adapter)
 
 def github_get(url, params=None):
-    global CALL_COUNT
+    return github_request("GET", url, params=params)
+
+def github_graphql(query, variables=None):
+    return github_request("POST", GRAPHQL_URL, json={"query": query, "variables": variables or {}})
+
+def github_request(method, url, **kwargs):
+    resource = "graphql" if url == GRAPHQL_URL else "core"
+    cache_key = None
+    cached = None
+    if method == "GET" and HTTP_CACHE is not None:
+        cache_key = HTTP_CACHE.key(url, kwargs.get("params"))
+    attempt = 0
     while True:
-        response = requests.get(url, headers=HEADERS, params=params)
-        CALL_COUNT += 1
-        if response.status_code == 403:
-            remaining = int(response.headers.get("X-RateLimit-Remaining", 0))
-            reset = int(response.headers.get("X-RateLimit-Reset", time.time() + 60))
-            wait_time = max(reset - int(time.time()), 1)
-            logger.warning(f"Rate limit hit. Waiting {wait_time} seconds (resets at {reset})")
-            print(f"\n[Rate Limit] Waiting {wait_time} seconds...")
-            for i in range(wait_time, 0, -1):
-                print(f"  Resuming in {i} seconds...", end="\r")
-                time.sleep(1)
-            print()
+        headers = {}
+        if cache_key:
+            cached = HTTP_CACHE.lookup(cache_key)
+            if cached:
+                headers = HTTP_CACHE.conditional_headers(cached)
+        SCHEDULER.acquire(resource)
+        started = time.perf_counter()
+        try:
+            response = SESSION.request(method, url, headers=headers, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            METRICS.observe_http(resource, "error", time.perf_counter() - started)
+            if attempt >= MAX_RETRIES:
+                raise
+            attempt += 1
+            delay = SCHEDULER.backoff(attempt)
+            logger.warning(f"{method} {url} failed ({e}). Retry {attempt}/{MAX_RETRIES} in {delay:.1f}s")
+            SCHEDULER.wait(delay)
             continue
+
+        METRICS.observe_http(resource, response.status_code, time.perf_counter() - started)
+        SCHEDULER.record(resource, response)
+        if response.status_code == 304 and cached:
+            return HTTP_CACHE.replay(cached, response)
+        delay, reason = SCHEDULER.retry_delay(response, attempt)
+        if delay is None:
+            if cache_key and response.status_code == 200:
+                HTTP_CACHE.store(cache_key, response)
+            return response
+        if reason == "server error":
+            if attempt >= MAX_RETRIES:
+                return response
+            attempt += 1
+        logger.warning(f"{reason.capitalize()} on {url}. Waiting {delay:.0f} seconds")
+        SCHEDULER.wait(delay)
+
+
+class ResponseCache:
+    # On-disk store of GET responses with their ETag / Last-Modified. Repeat
+    # requests go out as conditional requests; GitHub answers 304 Not Modified
+    # when nothing changed, and 304s do not count against the rate limit.
+    # Least recently used entries are evicted once the cache exceeds max_bytes.
+    KEPT_HEADERS = ("Content-Type", "ETag", "Last-Modified", "Link")
+
+    def __init__(self, path, max_bytes):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                headers TEXT,
+                body BLOB,
+                size INTEGER,
+                last_used REAL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_used ON responses(last_used)")
+        self.conn.commit()
+        self.total_bytes = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(url, params=None):
+        return f"{url}?{urlencode(sorted((params or {}).items()))}"
+
+    def lookup(self, key):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT etag, last_modified, headers, body FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self.conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+            self.conn.commit()
+        return {"etag": row[0], "last_modified": row[1], "headers": json.loads(row[2]), "body": row[3]}
+
+    @staticmethod
+    def conditional_headers(entry):
+        headers = {}
+        if entry["etag"]:
+            headers["If-None-Match"] = entry["etag"]
+        if entry["last_modified"]:
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def replay(self, entry, not_modified):
+        # Rebuild the original 200 response, keeping the 304's fresh rate limit headers
+        response = requests.Response()
+        response.status_code = 200
+        response._content = zlib.decompress(entry["body"])
+        response.encoding = "utf-8"
+        response.headers = CaseInsensitiveDict(entry["headers"])
+        response.headers.update({k: v for k, v in not_modified.headers.items() if k.startswith("X-RateLimit")})
+        response.url = not_modified.url
+        response.request = not_modified.request
+        response.from_cache = True
+        with self.lock:
+            self.hits += 1
         return response
 
-failed_pr_log_file = None
+    def store(self, key, response):
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if not etag and not last_modified:
+            return
+        body = zlib.compress(response.content)
+        headers = {k: response.headers[k] for k in self.KEPT_HEADERS if k in response.headers}
+        with self.lock:
+            self.misses += 1
+            old = self.conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses (key, etag, last_modified, headers, body, size, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, etag, last_modified, json.dumps(headers), body, len(body), time.time()),
+            )
+            self.total_bytes += len(body) - (old[0] if old else 0)
+            if self.total_bytes > self.max_bytes:
+                self._evict()
+            self.conn.commit()
+
+    def _evict(self):
+        # Drop least recently used entries down to 90% of the cap
+        target = self.max_bytes * 0.9
+        freed = []
+        for key, size in self.conn.execute("SELECT key, size FROM responses ORDER BY last_used"):
+            if self.total_bytes <= target:
+                break
+            freed.append((key,))
+            self.total_bytes -= size
+        self.conn.executemany("DELETE FROM responses WHERE key = ?", freed)
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+class PageArchive:
+    # Append-only store of every PR page and issue title lookup exactly as the API
+    # returned it. Each page is one gzip member appended to the repo's current
+    # segment (archive/<owner>__<name>/segment-NNNNN.jsonl.gz), so a segment is
+    # itself a valid gzip JSONL file. index.db maps (repo, page) to segment and
+    # byte range.
+    def __init__(self, root, segment_bytes=ARCHIVE_SEGMENT_MB * 1024 * 1024):
+        self.root = root
+        self.segment_bytes = segment_bytes
+        self.lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+        self.index = sqlite3.connect(os.path.join(root, "index.db"), check_same_thread=False)
+        self.index.execute("""
+            CREATE TABLE IF NOT EXISTS pages (
+                id INTEGER PRIMARY KEY,
+                repo TEXT,
+                kind TEXT,
+                page TEXT,
+                segment TEXT,
+                offset INTEGER,
+                length INTEGER,
+                fetched_at TEXT
+            )
+        """)
+        self.index.execute("CREATE INDEX IF NOT EXISTS idx_pages_repo_page ON pages(repo, page)")
+        self.index.commit()
+
+    def _segment_for(self, repo):
+        repo_dir = os.path.join(self.root, repo.replace("/", "__"))
+        os.makedirs(repo_dir, exist_ok=True)
+        segments = sorted(f for f in os.listdir(repo_dir) if f.startswith("segment-"))
+        if segments and os.path.getsize(os.path.join(repo_dir, segments[-1])) < self.segment_bytes:
+            name = segments[-1]
+        else:
+            name = f"segment-{len(segments) + 1:05d}.jsonl.gz"
+        return os.path.join(repo.replace("/", "__"), name)
+
+    def append(self, repo, kind, page, payload):
+        fetched_at = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+        record = {"repo": repo, "kind": kind, "page": page, "fetched_at": fetched_at, "payload": payload}
+        member = gzip.compress((json.dumps(record) + "\n").encode("utf-8"))
+        with self.lock:
+            segment = self._segment_for(repo)
+            path = os.path.join(self.root, segment)
+            with open(path, "ab") as f:
+                offset = f.tell()
+                f.write(member)
+            self.index.execute(
+                "INSERT INTO pages (repo, kind, page, segment, offset, length, fetched_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (repo, kind, str(page), segment, offset, len(member), fetched_at),
+            )
+            self.index.commit()
+
+    def repos(self):
+        with self.lock:
+            return [row[0] for row in self.index.execute("SELECT DISTINCT repo FROM pages ORDER BY repo")]
+
+    def entries(self, repo):
+        with self.lock:
+            rows = self.index.execute(
+                "SELECT kind, page, segment, offset, length FROM pages WHERE repo = ? ORDER BY id", (repo,)
+            ).fetchall()
+        return [dict(zip(("kind", "page", "segment", "offset", "length"), row)) for row in rows]
+
+    def read(self, entry):
+        with open(os.path.join(self.root, entry["segment"]), "rb") as f:
+            f.seek(entry["offset"])
+            return json.loads(gzip.decompress(f.read(entry["length"])))["payload"]
+
+def archive_page(repo, kind, page, payload, response):
+    # Pages replayed from the HTTP cache were archived when first fetched
+    if ARCHIVE is not None and not getattr(response, "from_cache", False):
+        ARCHIVE.append(repo, kind, page, payload)
+
+
+class RequestScheduler:
+    # Shared by all fetch workers. Reads the rate limit headers of every response.
+    # Requests go out at full speed while plenty of quota is left; once the
+    # remaining quota drops below PACING_THRESHOLD of the window's limit they are
+    # spaced so what is left lasts until the reset, instead of bursting into a
+    # 403 and stalling every worker at once.
+    def __init__(self, reserve=RATE_LIMIT_RESERVE, threshold=PACING_THRESHOLD):
+        self.reserve = reserve
+        self.threshold = threshold
+        self.lock = threading.Lock()
+        self.limits = {}      # resource -> {"limit": int, "remaining": int, "reset": epoch seconds}
+        self.next_slot = {}   # resource -> earliest start time of the next request
+        self.calls = 0
+        self.retries = 0
+        self.wait_seconds = 0.0    # rate limit, Retry-After and backoff waits
+        self.pacing_seconds = 0.0  # spacing requests near the end of the quota
+        self.quota_curve = []  # (epoch seconds, resource, remaining)
+
+    def acquire(self, resource):
+        with self.lock:
+            now = time.time()
+            start = max(now, self.next_slot.get(resource, 0.0))
+            # Spacing is measured from this request's own slot, which may already be
+            # queued behind other workers, so the slots never run past the reset;
+            # a slot at or after the reset starts a fresh window and is not paced
+            interval = 0.0
+            limit = self.limits.get(resource)
+            if limit and limit["reset"] > start:
+                usable = limit["remaining"] - self.reserve
+                if usable <= limit["limit"] * self.threshold:
+                    interval = (limit["reset"] - start) / max(usable, 1)
+            self.next_slot[resource] = start + interval
+            self.calls += 1
+            if start > now:
+                self.pacing_seconds += start - now
+        if start > now:
+            time.sleep(start - now)
+
+    def record(self, resource, response):
+        headers = response.headers
+        if "X-RateLimit-Remaining" not in headers:
+            return
+        resource = headers.get("X-RateLimit-Resource", resource)
+        remaining = int(headers["X-RateLimit-Remaining"])
+        reset = int(headers.get("X-RateLimit-Reset", time.time() + 3600))
+        quota = int(headers.get("X-RateLimit-Limit", max(remaining, 1)))
+        with self.lock:
+            self.limits[resource] = {"limit": quota, "remaining": remaining, "reset": reset}
+            self.quota_curve.append((round(time.time(), 3), resource, remaining))
+
+    def retry_delay(self, response, attempt):
+        status = response.status_code
+        headers = response.headers
+        if status in (403, 429) or (status == 200 and headers.get("X-RateLimit-Remaining") == "0"
+                                    and '"RATE_LIMITED"' in response.text):
+            if "Retry-After" in headers:
+                return int(headers["Retry-After"]) + random.uniform(0, 1), "secondary rate limit"
+            if headers.get("X-RateLimit-Remaining") == "0":
+                reset = int(headers.get("X-RateLimit-Reset", time.time() + 60))
+                return max(reset - time.time(), 1) + random.uniform(0, 1), "rate limit"
+            if status == 429 or "rate limit" in response.text.lower():
+                # Secondary limit without a hint: GitHub asks for at least a minute
+                return min(60 * 2 ** attempt, BACKOFF_MAX) + random.uniform(0, 5), "secondary rate limit"
+            return None, None
+        if status >= 500:
+            return self.backoff(attempt + 1), "server error"
+        return None, None
+
+    def backoff(self, attempt):
+        # Full jitter keeps concurrent workers from retrying in lockstep
+        return random.uniform(0, min(BACKOFF_BASE * 2 ** attempt, BACKOFF_MAX))
+
+    def wait(self, seconds):
+        if seconds <= 0:
+            return
+        with self.lock:
+            self.wait_seconds += seconds
+            self.retries += 1
+        time.sleep(seconds)
+
+    def metrics(self):
+        with self.lock:
+            return {
+                "calls": self.calls,
+                "retries": self.retries,
+                "wait_seconds": round(self.wait_seconds, 1),
+                "pacing_seconds": round(self.pacing_seconds, 1),
+                "limits": {k: dict(v) for k, v in self.limits.items()},
+                "quota_curve": list(self.quota_curve),
+            }
+
+SCHEDULER = RequestScheduler()
+
+class RunMetrics:
+    # Per-repo stage timings and HTTP latency histograms for the run summary.
+    # Stages: fetch (paging the API), parse (decoding and filtering pages),
+    # write (DB writer time) and issues (linked issue resolution).
+    def __init__(self, buckets=HTTP_LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.stages = defaultdict(lambda: defaultdict(lambda: {"seconds": 0.0, "count": 0}))
+        self.http = defaultdict(lambda: {"count": 0, "seconds": 0.0, "statuses": defaultdict(int),
+                                         "histogram": [0] * (len(buckets) + 1)})
+        self.repos = {}
+        self.api_start = SCHEDULER.metrics()  # the scheduler outlives a run in a long-lived process
+
+    @contextmanager
+    def timer(self, repo, stage):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(repo, stage, time.perf_counter() - started)
+
+    def add(self, repo, stage, seconds):
+        with self.lock:
+            entry = self.stages[repo][stage]
+            entry["seconds"] += seconds
+            entry["count"] += 1
+
+    def observe_http(self, resource, status, seconds):
+        bucket = next((i for i, bound in enumerate(self.buckets) if seconds <= bound), len(self.buckets))
+        with self.lock:
+            entry = self.http[resource]
+            entry["count"] += 1
+            entry["seconds"] += seconds
+            entry["statuses"][str(status)] += 1
+            entry["histogram"][bucket] += 1
+
+    def repo_result(self, repo, **fields):
+        with self.lock:
+            self.repos.setdefault(repo, {}).update(fields)
+
+    def api(self):
+        api = SCHEDULER.metrics()
+        for key in ("calls", "retries", "wait_seconds", "pacing_seconds"):
+            api[key] = round(api[key] - self.api_start[key], 1)
+        return api
+
+    def summary(self):
+        api = self.api()
+        with self.lock:
+            repos = {
+                repo: {**self.repos.get(repo, {}),
+                       **{stage: {"seconds": round(v["seconds"], 3), "count": v["count"]} for stage, v in stages.items()}}
+                for repo, stages in self.stages.items()
+            }
+            totals = defaultdict(float)
+            for stages in self.stages.values():
+                for stage, v in stages.items():
+                    totals[stage] += v["seconds"]
+            labels = [f"<={bound}s" for bound in self.buckets] + [f">{self.buckets[-1]}s"]
+            http = {
+                resource: {"count": v["count"], "mean_seconds": round(v["seconds"] / max(v["count"], 1), 4),
+                           "statuses": dict(v["statuses"]), "histogram": dict(zip(labels, v["histogram"]))}
+                for resource, v in self.http.items()
+            }
+        return {
+            "started_at": datetime.fromtimestamp(self.started, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "elapsed_seconds": round(time.time() - self.started, 1),
+            "api": {"calls": api["calls"], "retries": api["retries"], "rate_limit_wait_seconds": api["wait_seconds"],
+                    "pacing_seconds": api["pacing_seconds"],
+                    "limits": api["limits"]},
+            "http_cache": None if HTTP_CACHE is None else {"not_modified": HTTP_CACHE.hits, "refreshed": HTTP_CACHE.misses},
+            "http": http,
+            "stage_seconds": {stage: round(seconds, 3) for stage, seconds in totals.items()},
+            "repos": repos,
+        }
 
-def insert_prs(conn, repo, pr_list):
-    global failed_pr_log_file
-    c = conn.cursor()
-    for pr in tqdm(pr_list, desc=f"Inserting {repo} PRs"):
+    def write(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.summary(), f, indent=2)
+
+METRICS = RunMetrics()
+
+class Profiler:
+    # Before 3.12 cProfile only sees the thread that enabled it, so every fetch job
+    # and DB writer job is profiled on its own and the stats are merged at the end.
+    # From 3.12 it runs on sys.monitoring, which sees every thread but allows one
+    # active profiler per process, so a single profile runs for the whole run.
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stats = None
+        self.profile = None
+        if sys.version_info >= (3, 12):
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+
+    def run(self, fn, *args):
+        if self.profile is not None:
+            return fn(*args)
+        profile = cProfile.Profile()
+        try:
+            return profile.runcall(fn, *args)
+        finally:
+            with self.lock:
+                if self.stats is None:
+                    self.stats = pstats.Stats(profile)
+                else:
+                    self.stats.add(profile)
+
+    def dump(self, path, top=25):
+        if self.profile is not None:
+            self.profile.disable()
+            self.stats = pstats.Stats(self.profile)
+        if self.stats is None:
+            return
+        self.stats.dump_stats(path)
+        out = io.StringIO()
+        pstats.Stats(path, stream=out).sort_stats("cumulative").print_stats(top)
+        print(out.getvalue())
+        print(f"Profile written to {path} (python -m pstats {path})")
+
+PROFILER = None  # Profiler, set by start_run() for --profile
+
+def profiled(fn, *args):
+    return PROFILER.run(fn, *args) if PROFILER is not None else fn(*args)
+
+def print_api_metrics():
+    metrics = METRICS.api()
+    print(f"\nAPI calls: {metrics['calls']} ({metrics['retries']} retried), "
+          f"{metrics['wait_seconds']}s spent waiting on rate limits and retries, "
+          f"{metrics['pacing_seconds']}s pacing requests near the end of the quota")
+    if HTTP_CACHE is not None:
+        print(f"HTTP cache: {HTTP_CACHE.hits} not modified (304), {HTTP_CACHE.misses} refreshed")
+    stages = METRICS.summary()["stage_seconds"]
+    if stages:
+        print("Time by stage: " + ", ".join(f"{stage} {seconds:.1f}s" for stage, seconds in sorted(stages.items())))
+
+@dataclass
+class CollectorConfig:
+    # One collection run; main() builds it from the command line, a long-lived
+    # process can build its own and call collect() once per cycle
+    repos: list = None  # (lang, "owner/name") pairs, read from repo_file when None
+    repo_file: str = REPO_FILE
+    db_file: str = DB_FILE
+    time_start: str = TIME_START
+    time_end: str = TIME_END
+    workers: int = None  # $MAX_WORKERS, else MAX_WORKERS, when None
+    backend: str = "rest"
+    token: str = None  # GITHUB_TOKEN from the environment when None
+    api_url: str = None  # GITHUB_API_URL when None
+    http_cache: bool = True
+    http_cache_file: str = HTTP_CACHE_FILE
+    archive: bool = True
+    archive_dir: str = ARCHIVE_DIR
+    data_log: bool = True
+    profile: bool = False
+    log_dir: str = "."
+
+RUN_ID = None
+FAILED_PR_LOG = "failed_prs.jsonl"  # run files are named per run by start_run()
+RUN_SUMMARY_FILE = "run_summary.json"
+PROFILE_FILE = "profile.prof"
+
+def run_workers(config):
+    # Environment settings are read per run, after main() has loaded .env
+    return config.workers or int(os.getenv("MAX_WORKERS", MAX_WORKERS))
+
+def start_run(config, api=True):
+    global RUN_ID, FAILED_PR_LOG, RUN_SUMMARY_FILE, PROFILE_FILE, METRICS, PROFILER, HTTP_CACHE, ARCHIVE
+    RUN_ID = datetime.now().strftime('%Y%m%d_%H%M%S')
+    FAILED_PR_LOG = os.path.join(config.log_dir, f"failed_prs_{RUN_ID}.jsonl")
+    RUN_SUMMARY_FILE = os.path.join(config.log_dir, f"run_summary_{RUN_ID}.json")
+    PROFILE_FILE = os.path.join(config.log_dir, f"profile_{RUN_ID}.prof")
+    setup_logging(RUN_ID, config.log_dir, config.data_log)
+    METRICS = RunMetrics()
+    PROFILER = Profiler() if config.profile else None
+    if config.archive and (ARCHIVE is None or ARCHIVE.root != config.archive_dir):
+        ARCHIVE = PageArchive(config.archive_dir)
+    elif not config.archive:
+        ARCHIVE = None
+    if api:
+        configure_session(run_workers(config), config.token, config.api_url)
+        if config.http_cache and (HTTP_CACHE is None or HTTP_CACHE.path != config.http_cache_file):
+            max_mb = int(os.getenv("HTTP_CACHE_MAX_MB", HTTP_CACHE_MAX_MB))
+            HTTP_CACHE = ResponseCache(config.http_cache_file, max_mb * 1024 * 1024)
+        elif not config.http_cache:
+            HTTP_CACHE = None
+        if HTTP_CACHE is not None:
+            HTTP_CACHE.hits = HTTP_CACHE.misses = 0
+
+def finish_run():
+    print_api_metrics()
+    METRICS.write(RUN_SUMMARY_FILE)
+    print(f"Run summary written to {RUN_SUMMARY_FILE}")
+    if PROFILER is not None:
+        PROFILER.dump(PROFILE_FILE)
+    close_logging()
+
+UPSERT_PR_SQL = """
+    INSERT INTO pull_requests (
+        id, repo, number, title, state, created_at, updated_at,
+        closed_at, merged_at, user_login, user_id,
+        head_ref, head_repo_full_name
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(id) DO UPDATE SET
+        title = excluded.title,
+        state = excluded.state,
+        updated_at = excluded.updated_at,
+        closed_at = excluded.closed_at,
+        merged_at = excluded.merged_at,
+        head_ref = excluded.head_ref,
+        head_repo_full_name = excluded.head_repo_full_name
+"""
+
+# A NULL title is filled in later by resolve_issue_titles
+INSERT_PR_ISSUE_SQL = """
+    INSERT INTO pr_issues (pr_id, issue_number, issue_title) VALUES (?, ?, ?)
+    ON CONFLICT(pr_id, issue_number) DO UPDATE SET
+        issue_title = COALESCE(excluded.issue_title, pr_issues.issue_title)
+"""
+
+def pr_to_row(repo, pr):
+    return (
+        pr["id"],
+        repo,
+        pr["number"],
+        pr["title"],
+        pr["state"],
+        pr["created_at"],
+        pr["updated_at"],
+        pr.get("closed_at"),
+        pr.get("merged_at"),
+        pr["user"]["login"] if pr.get("user") else None,
+        pr["user"]["id"] if pr.get("user") else None,
+        pr["head"]["ref"] if pr.get("head") else None,
+        pr["head"]["repo"]["full_name"] if pr["head"].get("repo") else None,
+    )
+
+def upsert_pr_chunk(conn, repo, chunk):
+    # Writes PRs and their issue links without committing; returns PRs that failed to parse
+    failed = []
+    pr_rows = []
+    issue_rows = []
+    title_rows = []
+    log_lines = []
+    log_data = data_log_enabled()
+    for pr in chunk:
         if pr.get("user", {}).get("type") == "Bot":
             continue
-
         try:
-            pr_id = pr["id"]
-            pr_number = pr["number"]
-            pr_title = pr["title"]
-            pr_state = pr["state"]
-            pr_created = pr["created_at"]
-            pr_updated = pr["updated_at"]
-            pr_closed = pr.get("closed_at")
-            pr_merged = pr.get("merged_at")
-            pr_user_login = pr["user"]["login"] if pr.get("user") else None
-            pr_user_id = pr["user"]["id"] if pr.get("user") else None
-            pr_head_ref = pr["head"]["ref"] if pr.get("head") else None
-            pr_head_repo = pr["head"]["repo"]["full_name"] if pr["head"].get("repo") else None
-            pr_body = pr.get("body", "")
-
-            c.execute("""
-                INSERT OR IGNORE INTO pull_requests (
-                    id, repo, number, title, state, created_at, updated_at,
-                    closed_at, merged_at, user_login, user_id,
-                    head_ref, head_repo_full_name
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                pr_id, repo, pr_number, pr_title, pr_state, pr_created, pr_updated,
-                pr_closed, pr_merged, pr_user_login, pr_user_id, pr_head_ref, pr_head_repo
-            ))
-
-            status = pr.get("__validation_type", "corrected")
-            data_logger.info(f"{status.upper()} PR: {repo} #{pr_number} by {pr_user_login} on {pr_created}: {pr_title}")
-
-
-            issue_numbers = extract_linked_issues(pr_body)
-            for issue_number in issue_numbers:
-                issue_title = fetch_issue_title(repo, issue_number)
-                if issue_title:
-                    c.execute("""
-                        INSERT OR IGNORE INTO pr_issues (pr_id, issue_number, issue_title)
-                        VALUES (?, ?, ?)
-                    """, (pr_id, issue_number, issue_title))
-                    data_logger.info(f"  Linked ISSUE: #{issue_number} - {issue_title}")
-
+            row = pr_to_row(repo, pr)
         except Exception as e:
             logger.warning(f"Failed to insert PR #{pr.get('number')} from {repo}: {e}")
-            if not failed_pr_log_file:
-                fail_log_name = f"failed_prs_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl"
-                failed_pr_log_file = open(fail_log_name, "w", encoding="utf-8")
-            failed_pr_log_file.write(json.dumps(pr) + "\n")
-
-    if failed_pr_log_file:
-        failed_pr_log_file.close()
+            failed.append(pr)
+            continue
+        pr_rows.append(row)
+        closing_issues = pr.get("__closing_issues", {})
+        linked = set(extract_linked_issues(pr.get("body", ""))) | set(closing_issues)
+        issue_rows.extend((row[0], num, closing_issues.get(num)) for num in sorted(linked))
+        title_rows.extend((repo, num, title) for num, title in closing_issues.items())
+        if log_data:
+            status = pr.get("__validation_type", "corrected")
+            log_lines.append(f"{status.upper()} PR: {repo} #{row[2]} by {row[9]} on {row[5]}: {row[3]}")
+
+    conn.executemany(UPSERT_PR_SQL, pr_rows)
+    conn.executemany(INSERT_PR_ISSUE_SQL, issue_rows)
+    conn.executemany("INSERT OR IGNORE INTO issue_titles (repo, issue_number, issue_title) VALUES (?, ?, ?)", title_rows)
+    if pr_rows:
+        ids = [row[0] for row in pr_rows]
+        refresh_summaries(conn, "SELECT value FROM json_each(?)", (json.dumps(ids),))
+    if log_lines:
+        data_logger.info("\n".join(log_lines))
+    return failed
+
+def log_failed_prs(failed):
+    if failed:
+        with open(FAILED_PR_LOG, "a", encoding="utf-8") as f:
+            for pr in failed:
+                f.write(json.dumps(pr) + "\n")
 
+def insert_prs(conn, repo, pr_list):
+    # executemany upserts, committed every WRITE_CHUNK_SIZE PRs
+    failed = []
+    pbar = tqdm(total=len(pr_list), desc=f"Inserting {repo} PRs")
+    for start in range(0, len(pr_list), WRITE_CHUNK_SIZE):
+        chunk = pr_list[start:start + WRITE_CHUNK_SIZE]
+        with METRICS.timer(repo, "write"):
+            failed.extend(upsert_pr_chunk(conn, repo, chunk))
+            conn.commit()
+        pbar.update(len(chunk))
+    pbar.close()
+    log_failed_prs(failed)
+
+def write_page(conn, repo, pr_list, next_page, pending_updated_at=None):
+    # The page's rows and the cursor pointing past it commit in one transaction,
+    # so an interrupted run resumes exactly after the last page that was stored
+    with METRICS.timer(repo, "write"):
+        failed = upsert_pr_chunk(conn, repo, pr_list)
+        conn.execute("""
+            UPDATE sync_state
+            SET next_page = ?, pending_updated_at = COALESCE(?, pending_updated_at), pages_done = pages_done + 1
+            WHERE repo = ?
+        """, (None if next_page is None else str(next_page), pending_updated_at, repo))
+        conn.commit()
+    log_failed_prs(failed)
+
+def pending_issue_numbers(conn, repo):
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT DISTINCT i.issue_number
+        FROM pr_issues i JOIN pull_requests p ON p.id = i.pr_id
+        WHERE p.repo = ? AND i.issue_title IS NULL
+          AND NOT EXISTS (SELECT 1 FROM issue_titles t WHERE t.repo = p.repo AND t.issue_number = i.issue_number)
+        ORDER BY i.issue_number
+    """, (repo,))
+    return [row[0] for row in cur.fetchall()]
+
+def store_issue_titles(conn, repo, titles):
+    fetched_at = datetime.now().strftime("%Y-%m-%dT%H:%M:%S")
+    conn.executemany("""
+        INSERT OR REPLACE INTO issue_titles (repo, issue_number, issue_title, fetched_at)
+        VALUES (?, ?, ?, ?)
+    """, [(repo, num, title, fetched_at) for num, title in titles.items()])
     conn.commit()
-
-def load_checkpoint():
-    checkpoint_file = "checkpoint.json"
-    if os.path.exists(checkpoint_file):
-        with open(checkpoint_file, "r") as f:
-            return json.load(f)
-    return {"finished": False, "completed": []}
-
-def save_checkpoint(completed_repos, finished=False):
-    with open("checkpoint.json", "w") as f:
-        json.dump({"finished": finished, "completed": completed_repos}, f, indent=2)
-
-
-def main():
-    df = pd.read_csv(REPO_FILE)
-    grouped = df.groupby("Lang")
-    language_list = list(grouped.groups.keys())
-
-    conn = sqlite3.connect(DB_FILE)
+    if data_log_enabled():
+        lines = [f"  Linked ISSUE: {repo} #{num} - {title}" for num, title in titles.items() if title]
+        if lines:
+            data_logger.info("\n".join(lines))
+
+def apply_issue_titles(conn, repo):
+    # Copy cached titles onto pending links, then drop links to numbers that do not exist.
+    # Only the PRs whose links change here need their summaries (and export partitions) redone.
+    c = conn.cursor()
+    c.execute("CREATE TEMP TABLE IF NOT EXISTS title_changes (pr_id INTEGER PRIMARY KEY)")
+    c.execute("DELETE FROM title_changes")
+    c.execute("""
+        INSERT OR IGNORE INTO title_changes (pr_id)
+        SELECT i.pr_id FROM pr_issues i JOIN pull_requests p ON p.id = i.pr_id
+        JOIN issue_titles t ON t.repo = p.repo AND t.issue_number = i.issue_number
+        WHERE p.repo = ? AND i.issue_title IS NULL
+    """, (repo,))
+    c.execute("""
+        UPDATE pr_issues
+        SET issue_title = (SELECT t.issue_title FROM issue_titles t WHERE t.repo = ? AND t.issue_number = pr_issues.issue_number)
+        WHERE issue_title IS NULL AND pr_id IN (SELECT id FROM pull_requests WHERE repo = ?)
+    """, (repo, repo))
+    resolved = c.rowcount
+    c.execute("""
+        DELETE FROM pr_issues
+        WHERE issue_title IS NULL AND pr_id IN (SELECT id FROM pull_requests WHERE repo = ?)
+          AND issue_number IN (SELECT issue_number FROM issue_titles WHERE repo = ? AND issue_title IS NULL)
+    """, (repo, repo))
+    dropped = c.rowcount
+    refresh_summaries(conn, "SELECT pr_id FROM title_changes")
+    conn.commit()
+    return resolved - dropped
+
+def fetch_issue_titles_split(repo, issue_numbers):
+    # A rejected query says nothing about which ref caused it; halve the batch
+    # until the bad ref is alone so it cannot hold back the others
+    titles = fetch_issue_titles(repo, issue_numbers)
+    if titles is None and len(issue_numbers) > 1:
+        half = len(issue_numbers) // 2
+        return {**fetch_issue_titles_split(repo, issue_numbers[:half]),
+                **fetch_issue_titles_split(repo, issue_numbers[half:])}
+    return titles or {}
+
+def resolve_issue_titles(writer, repo):
+    pending = writer.submit(pending_issue_numbers, repo).result()
+    # Numbers no issue can have are cached as missing without asking GitHub
+    invalid = [num for num in pending if not 1 <= num <= GRAPHQL_INT_MAX]
+    if invalid:
+        writer.submit(store_issue_titles, repo, dict.fromkeys(invalid))
+    pending = [num for num in pending if 1 <= num <= GRAPHQL_INT_MAX]
+    batches = [pending[i:i + ISSUE_BATCH_SIZE] for i in range(0, len(pending), ISSUE_BATCH_SIZE)]
+    for batch in tqdm(batches, desc=f"Resolving {repo} issues", unit="batch", disable=not batches):
+        titles = fetch_issue_titles_split(repo, batch)
+        if titles:
+            writer.submit(store_issue_titles, repo, titles)
+    return writer.submit(apply_issue_titles, repo).result()
+
+def list_db_repos(conn):
+    cur = conn.cursor()
+    cur.execute("SELECT DISTINCT repo FROM pull_requests ORDER BY repo")
+    return [row[0] for row in cur.fetchall()]
+
+def resolve_all_issue_titles(db_file, workers):
+    # Standalone stage for PRs already in the DB; no PR pages are fetched
+    writer = DBWriter(db_file)
+    try:
+        repos = writer.submit(list_db_repos).result()
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="issues") as pool:
+            futures = {pool.submit(resolve_issue_titles, writer, repo): repo for repo in repos}
+            for future in as_completed(futures):
+                print(f"Resolved {future.result()} linked issues for {futures[future]}.")
+    finally:
+        writer.close()
+
+
+def archived_prs(repo, kind, payload):
+    if kind == "graphql_pulls":
+        return [graphql_pr_to_rest(repo, node) for node in payload["nodes"]]
+    return payload
+
+def replay_archive(db_file, archive, time_start=None, time_end=None):
+    # Rebuilds pull_requests / pr_issues from archived pages without any API call.
+    # Pages replay in fetch order, so the latest copy of each PR wins.
+    time_start = time_start or TIME_START
+    time_end = time_end or TIME_END
+    conn = connect_db(db_file)
     create_db_schema(conn)
+    for repo in archive.repos():
+        entries = archive.entries(repo)
+        prs_by_id = {}
+        titles = {}
+        for entry in entries:
+            if entry["kind"] == "graphql_issue_titles":
+                titles.update({int(alias[1:]): (node or {}).get("title") for alias, node in archive.read(entry).items()})
+                continue
+            for pr in archived_prs(repo, entry["kind"], archive.read(entry)):
+                if pr.get("user", {}).get("type") != "Bot" and in_window(pr, time_start, time_end):
+                    prs_by_id[pr["id"]] = pr
+        insert_prs(conn, repo, list(prs_by_id.values()))
+        if titles:
+            store_issue_titles(conn, repo, titles)
+        apply_issue_titles(conn, repo)
+        print(f"Replayed {len(prs_by_id)} PRs for {repo} from {len(entries)} archived pages.")
+    conn.close()
 
-    checkpoint = load_checkpoint()
-    finished = checkpoint.get("finished", False)
-    completed_repos = set(checkpoint.get("completed", []))
-
-    total_langs = len(language_list)
-    lang_counter = 0
-
-    for lang, group in grouped:
-        lang_counter += 1
-        print(f"\n== Processing language: {lang} ({lang_counter}/{total_langs}) ==")
-
-        repo_entries = group["Public repo"].tolist()
-        repo_list = []
-        for entry in repo_entries:
-            repos = [r.strip() for r in re.split(r"&&|,", entry) if r.strip()]
-            repo_list.extend(repos)
-
-        total_repos = sum(len([r.strip() for entry in group_["Public repo"].tolist() for r in re.split(r"&&|,", entry) if r.strip()]) for _, group_ in grouped)
-        global_repo_idx = len(completed_repos)
 
-        for idx, repo_url in enumerate(repo_list):
+class DBWriter:
+    # Owns the only SQLite connection. Fetch workers never touch the DB directly,
+    # they queue jobs here and get a Future back; jobs run one at a time in order.
+    def __init__(self, db_file):
+        self.db_file = db_file
+        self.jobs = queue.Queue()
+        self.thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        conn = connect_db(self.db_file)
+        create_db_schema(conn)
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                break
+            fn, args, future = job
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(profiled(fn, conn, *args))
+            except Exception as e:
+                future.set_exception(e)
+        conn.close()
+
+    def submit(self, fn, *args):
+        future = Future()
+        self.jobs.put((fn, args, future))
+        return future
+
+    def close(self):
+        self.jobs.put(None)
+        self.thread.join()
+
+
+def load_repo_list(repo_file):
+    with open(repo_file, newline="", encoding="utf-8") as f:
+        rows = [row for row in csv.DictReader(f) if row.get("Lang") and row.get("Public repo")]
+    # Grouped by language, file order within a language
+    rows.sort(key=lambda row: row["Lang"])
+    repo_list = []
+    for row in rows:
+        for repo_url in [r.strip() for r in re.split(r"&&|,", row["Public repo"]) if r.strip()]:
             if "github.com/" not in repo_url:
                 continue
-            repo = repo_url.split("github.com/")[-1].strip("/")
-            global_repo_idx += 1
-            print(f"\nProcessing {repo} ({global_repo_idx}/{total_repos})")
-
-            if repo in completed_repos:
-                print(f"  Skipping {repo}, already completed. Validating count...")
-                cur = conn.cursor()
-                cur.execute("SELECT COUNT(*) FROM pull_requests WHERE repo = ?", (repo,))
-                local_count = cur.fetchone()[0]
-
-                owner, name = repo.split("/")
-                url = f"https://api.github.com/repos/{owner}/{name}/issues"
-                params = {"state": "all", "per_page": 100, "page": 1, "since": "2025-01-01T00:00:00Z"}
-                remote_count = 0
-                latest_created = ""
-
-                while True:
-                    response = github_get(url, params=params)
-                    if response.status_code != 200:
-                        print(f"Failed to fetch for validation: {repo}")
-                        break
-                    page_data = [pr for pr in response.json() if "pull_request" in pr and pr.get("user", {}).get("type") != "Bot"]
-                    if page_data:
-                        latest_created = page_data[0]["created_at"] if not latest_created else latest_created
-                    remote_count += len(page_data)
-                    if len(page_data) < 100:
-                        break
-                    params["page"] += 1
-
-                if remote_count == local_count:
-                    print(f"  ✅ Repo {repo} validated (GitHub = {remote_count}, DB = {local_count})")
-                    continue
-                elif remote_count > local_count:
-                    print(f"  ⚠️ Repo {repo} has more PRs on GitHub ({remote_count}) than DB ({local_count})")
-                    print(f"  📅 Checking for new PRs since {latest_created}...")
-                else:
-                    print(f"  ❌ Repo {repo} has fewer PRs in GitHub ({remote_count}) than DB ({local_count})")
-
-            pr_list = fetch_all_prs(repo)
-            insert_prs(conn, repo, pr_list)
-            print(f"Inserted {len(pr_list)} PRs for {repo}.")
-            completed_repos.add(repo)
-            save_checkpoint(list(completed_repos), finished=False)
+            repo_list.append((row["Lang"], repo_url.split("github.com/")[-1].strip("/")))
+    return repo_list
+
+def load_sync_state(conn, repo):
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT last_updated_at, last_pr_number, mode, next_page, pending_updated_at, status, pages_done,
+               window_start, window_end, pending_window_start, pending_window_end
+        FROM sync_state WHERE repo = ?
+    """, (repo,))
+    row = cur.fetchone()
+    if row is None:
+        # Repos collected before sync_state existed start from what is already stored
+        cur.execute("SELECT MAX(updated_at), MAX(number) FROM pull_requests WHERE repo = ?", (repo,))
+        last_updated_at, last_pr_number = cur.fetchone()
+        if last_updated_at is None:
+            return None
+        row = (last_updated_at, last_pr_number, None, None, None, "done", 0, None, None, None, None)
+    return dict(zip(("last_updated_at", "last_pr_number", "mode", "next_page", "pending_updated_at", "status",
+                     "pages_done", "window_start", "window_end", "pending_window_start", "pending_window_end"), row))
+
+def window_covered(state, time_start, time_end):
+    # A sync only sees PRs updated since the watermark, so it is enough only when
+    # earlier passes already covered the whole requested window
+    return (state["window_start"] is not None and state["window_end"] is not None
+            and state["window_start"] <= time_start and time_end <= state["window_end"])
+
+def start_repo_sync(conn, repo, backend, time_start, time_end):
+    # Picks this run's mode for the repo and records it before the first page:
+    # resume an interrupted pass over the same window, sync from the watermark,
+    # or fetch the window in full
+    state = load_sync_state(conn, repo)
+    if (state and state["status"] == "in_progress" and state["mode"] in ("sync", backend)
+            and (state["pending_window_start"], state["pending_window_end"]) == (time_start, time_end)):
+        return state
+    if state and state["last_updated_at"] and window_covered(state, time_start, time_end):
+        mode, pending = "sync", state["last_updated_at"]
+    else:
+        # Anything updated after the full fetch started is picked up by the next sync
+        mode, pending = backend, datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    conn.execute("""
+        INSERT INTO sync_state (repo, last_updated_at, last_pr_number, mode, next_page,
+                                pending_updated_at, status, pages_done, pending_window_start, pending_window_end)
+        VALUES (?, ?, ?, ?, NULL, ?, 'in_progress', 0, ?, ?)
+        ON CONFLICT(repo) DO UPDATE SET
+            last_updated_at = excluded.last_updated_at,
+            last_pr_number = excluded.last_pr_number,
+            mode = excluded.mode,
+            next_page = NULL,
+            pending_updated_at = excluded.pending_updated_at,
+            status = 'in_progress',
+            pages_done = 0,
+            pending_window_start = excluded.pending_window_start,
+            pending_window_end = excluded.pending_window_end
+    """, (repo, state and state["last_updated_at"], state and state["last_pr_number"], mode, pending,
+          time_start, time_end))
+    conn.commit()
+    return load_sync_state(conn, repo)
+
+def finish_repo_sync(conn, repo):
+    conn.execute("""
+        UPDATE sync_state SET
+            last_updated_at = MAX(COALESCE(last_updated_at, ''), COALESCE(pending_updated_at, '')),
+            last_pr_number = (SELECT MAX(number) FROM pull_requests WHERE repo = ?),
+            last_synced_at = ?,
+            window_start = pending_window_start,
+            window_end = pending_window_end,
+            mode = NULL,
+            next_page = NULL,
+            pending_updated_at = NULL,
+            pending_window_start = NULL,
+            pending_window_end = NULL,
+            status = 'done'
+        WHERE repo = ?
+    """, (repo, datetime.now().strftime("%Y-%m-%dT%H:%M:%S"), repo))
+    conn.commit()
 
+def collect_repo(writer, repo, progress, backend="rest", time_start=None, time_end=None):
+    print(f"\nProcessing {repo} ({progress})")
+    time_start = time_start or TIME_START
+    time_end = time_end or TIME_END
+
+    state = writer.submit(start_repo_sync, repo, backend, time_start, time_end).result()
+    writes = []
+    upserted = 0
+
+    def on_page(prs, next_page, pending_updated_at=None):
+        nonlocal upserted
+        upserted += len(prs)
+        writes.append(writer.submit(write_page, repo, prs, next_page, pending_updated_at))
+
+    if state["next_page"]:
+        print(f"  Resuming {repo} after {state['pages_done']} stored pages")
+    elif state["mode"] != "sync" and state["last_updated_at"]:
+        print(f"  {time_start}..{time_end} is not covered by earlier syncs, fetching {repo} in full")
+    with METRICS.timer(repo, "fetch"):
+        if state["mode"] == "sync":
+            print(f"  Syncing {repo} changes since {state['last_updated_at']}")
+            fetch_incremental_prs(repo, state["last_updated_at"], state["last_pr_number"], time_start, time_end,
+                                  start_page=int(state["next_page"] or 1),
+                                  newest_updated=state["pending_updated_at"], on_page=on_page)
+        elif state["mode"] == "graphql":
+            fetch_all_prs_graphql(repo, time_start, time_end, start_page=state["next_page"], on_page=on_page)
+        else:
+            fetch_all_prs(repo, time_start, time_end, start_page=int(state["next_page"] or 1), on_page=on_page)
+
+    for future in writes:
+        future.result()
+    with METRICS.timer(repo, "issues"):
+        resolved = resolve_issue_titles(writer, repo)
+    writer.submit(finish_repo_sync, repo).result()
+    METRICS.repo_result(repo, mode=state["mode"], pages=len(writes), upserted=upserted, linked_issues=resolved)
+    print(f"Upserted {upserted} PRs for {repo}.")
+    return upserted
+
+
+def collect(config):
+    # Fetches every repo into config.db_file; returns the repos that failed
+    start_run(config)
+    repo_list = config.repos if config.repos is not None else load_repo_list(config.repo_file)
+    total_repos = len(repo_list)
+
+    writer = DBWriter(config.db_file)
+    failed = []
+    try:
+        with ThreadPoolExecutor(max_workers=run_workers(config), thread_name_prefix="fetch") as pool:
+            futures = {
+                pool.submit(profiled, collect_repo, writer, repo, f"{lang}, {idx}/{total_repos}", config.backend,
+                            config.time_start, config.time_end): repo
+                for idx, (lang, repo) in enumerate(repo_list, start=1)
+            }
+            for future in as_completed(futures):
+                repo = futures[future]
+                try:
+                    future.result()
+                except Exception as e:
+                    logger.warning(f"Failed to collect {repo}: {e}")
+                    failed.append(repo)
+    finally:
+        writer.close()
+        finish_run()
+    return failed
+
+def resolve_issues(config):
+    start_run(config)
+    try:
+        resolve_all_issue_titles(config.db_file, run_workers(config))
+    finally:
+        finish_run()
+
+def replay(config):
+    start_run(config, api=False)
+    try:
+        archive = ARCHIVE if ARCHIVE is not None else PageArchive(config.archive_dir)
+        replay_archive(config.db_file, archive, config.time_start, config.time_end)
+    finally:
+        close_logging()
+
+def load_tokens():
+    # GITHUB_TOKENS="tok1,tok2,..." is the pool for sharded runs; GITHUB_TOKEN alone is a pool of one
+    tokens = [t for t in re.split(r"[\s,]+", os.getenv("GITHUB_TOKENS", "")) if t]
+    if not tokens and os.getenv("GITHUB_TOKEN"):
+        tokens = [os.getenv("GITHUB_TOKEN")]
+    return tokens
+
+def shard_repos(repo_list, shards, index):
+    # A repo always lands in the same shard for a given shard count, so each
+    # shard DB keeps the sync watermarks of its own repos across runs
+    return [(lang, repo) for lang, repo in repo_list if zlib.crc32(repo.encode("utf-8")) % shards == index]
+
+def shard_config(config, shards, index, token=None):
+    shard_dir = os.path.join(SHARD_DIR, f"shard-{index:02d}")
+    os.makedirs(shard_dir, exist_ok=True)
+    repo_list = config.repos if config.repos is not None else load_repo_list(config.repo_file)
+    return replace(
+        config, repos=shard_repos(repo_list, shards, index), token=token or config.token, log_dir=shard_dir,
+        db_file=os.path.join(shard_dir, os.path.basename(config.db_file)),
+        http_cache_file=os.path.join(shard_dir, HTTP_CACHE_FILE), archive_dir=os.path.join(shard_dir, ARCHIVE_DIR),
+    )
+
+def shard_db_files(db_file):
+    pattern = re.compile(r"shard-\d+$")
+    if not os.path.isdir(SHARD_DIR):
+        return []
+    return [os.path.join(SHARD_DIR, d, os.path.basename(db_file)) for d in sorted(os.listdir(SHARD_DIR))
+            if pattern.match(d) and os.path.exists(os.path.join(SHARD_DIR, d, os.path.basename(db_file)))]
+
+def collect_sharded(config, shards=None):
+    # One process per shard, each with its own token (and so its own rate limit
+    # window) and its own DB; the shard DBs are merged into config.db_file after
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    tokens = [config.token] if config.token else load_tokens()
+    if not tokens:
+        raise Exception("GitHub token not found. Set GITHUB_TOKENS or GITHUB_TOKEN in .env or environment.")
+    shards = shards or len(tokens)
+    if shards > len(tokens):
+        print(f"{shards} shards share {len(tokens)} tokens; shards on the same token share its rate limit.")
+    configs = [shard_config(config, shards, i, tokens[i % len(tokens)]) for i in range(shards)]
+    failed = []
+    with ProcessPoolExecutor(max_workers=shards, mp_context=multiprocessing.get_context("spawn")) as pool:
+        futures = {pool.submit(collect, shard): i for i, shard in enumerate(configs) if shard.repos}
+        for future in as_completed(futures):
+            try:
+                failed.extend(future.result())
+            except Exception as e:
+                logger.warning(f"Shard {futures[future]} failed: {e}")
+                failed.extend(repo for _, repo in configs[futures[future]].repos)
+    merge_shards(config.db_file, [shard.db_file for shard in configs if os.path.exists(shard.db_file)])
+    return failed
+
+PR_COLUMNS = ("id, repo, number, title, state, created_at, updated_at, closed_at, merged_at, "
+              "user_login, user_id, head_ref, head_repo_full_name")
+
+def merge_shard(conn, shard_file):
+    # Upserts one shard DB into conn. A PR's newer updated_at wins and ties keep
+    # the row already there, so merging the same shards in the same order always
+    # gives the same DB, and re-merging an unchanged shard changes nothing.
+    conn.execute("ATTACH DATABASE ? AS shard", (shard_file,))
+    try:
+        with conn:
+            # Only PRs whose row or links differ need their summaries redone
+            conn.execute("DROP TABLE IF EXISTS temp.merged_prs")
+            conn.execute(f"""
+                CREATE TEMP TABLE merged_prs AS
+                SELECT id FROM (SELECT {PR_COLUMNS} FROM shard.pull_requests EXCEPT SELECT {PR_COLUMNS} FROM main.pull_requests)
+                UNION
+                SELECT pr_id FROM (SELECT pr_id, issue_number, issue_title FROM shard.pr_issues
+                                   EXCEPT SELECT pr_id, issue_number, issue_title FROM main.pr_issues)
+            """)
+            conn.execute(f"""
+                INSERT INTO main.pull_requests ({PR_COLUMNS})
+                SELECT {PR_COLUMNS} FROM shard.pull_requests WHERE id IN (SELECT id FROM temp.merged_prs)
+                ON CONFLICT(id) DO UPDATE SET
+                    title = excluded.title,
+                    state = excluded.state,
+                    updated_at = excluded.updated_at,
+                    closed_at = excluded.closed_at,
+                    merged_at = excluded.merged_at,
+                    head_ref = excluded.head_ref,
+                    head_repo_full_name = excluded.head_repo_full_name
+                WHERE excluded.updated_at > pull_requests.updated_at
+            """)
+            conn.execute("""
+                INSERT INTO main.pr_issues (pr_id, issue_number, issue_title)
+                SELECT pr_id, issue_number, issue_title FROM shard.pr_issues
+                WHERE pr_id IN (SELECT id FROM temp.merged_prs)
+                ON CONFLICT(pr_id, issue_number) DO UPDATE SET
+                    issue_title = COALESCE(excluded.issue_title, pr_issues.issue_title)
+            """)
+            conn.execute("""
+                INSERT INTO main.issue_titles (repo, issue_number, issue_title, fetched_at)
+                SELECT repo, issue_number, issue_title, fetched_at FROM shard.issue_titles WHERE true
+                ON CONFLICT(repo, issue_number) DO UPDATE SET
+                    issue_title = excluded.issue_title, fetched_at = excluded.fetched_at
+                WHERE COALESCE(excluded.fetched_at, '') > COALESCE(issue_titles.fetched_at, '')
+            """)
+            # The shard owns its repos' watermarks; the copy lets a plain run continue from them
+            conn.execute("""
+                INSERT INTO main.sync_state (repo, last_updated_at, last_pr_number, last_synced_at, status, pages_done,
+                                             window_start, window_end)
+                SELECT repo, last_updated_at, last_pr_number, last_synced_at, 'done', 0, window_start, window_end
+                FROM shard.sync_state WHERE status = 'done'
+                ON CONFLICT(repo) DO UPDATE SET
+                    last_updated_at = excluded.last_updated_at,
+                    last_pr_number = excluded.last_pr_number,
+                    last_synced_at = excluded.last_synced_at,
+                    window_start = excluded.window_start,
+                    window_end = excluded.window_end
+                WHERE COALESCE(excluded.last_updated_at, '') > COALESCE(sync_state.last_updated_at, '')
+                  AND sync_state.status = 'done'
+            """)
+            merged = conn.execute("SELECT COUNT(*) FROM temp.merged_prs").fetchone()[0]
+            refresh_summaries(conn, "SELECT id FROM temp.merged_prs")
+    finally:
+        conn.execute("DETACH DATABASE shard")
+    return merged
+
+def merge_shards(db_file, shard_files):
+    conn = connect_db(db_file)
+    create_db_schema(conn)
+    for shard_file in sorted(shard_files):
+        shard = connect_db(shard_file)
+        create_db_schema(shard)  # brings an older shard DB up to the current schema
+        shard.close()
+        print(f"Merged {merge_shard(conn, shard_file)} changed PRs from {shard_file}")
     conn.close()
-    save_checkpoint(list(completed_repos), finished=True)
-    print("\nAll repositories processed. Checkpoint updated as complete.")
+
+def add_arguments(parser):
+    parser.add_argument("--workers", type=int,
+                        help=f"number of repos fetched concurrently (default $MAX_WORKERS, else {MAX_WORKERS})")
+    parser.add_argument("--backend", choices=sorted(FETCH_BACKENDS), default="rest",
+                        help="API used for the first full fetch of a repo (default rest)")
+    parser.add_argument("--no-http-cache", action="store_true",
+                        help=f"do not use the conditional request cache in {HTTP_CACHE_FILE}")
+    parser.add_argument("--no-archive", action="store_true",
+                        help=f"do not keep raw PR pages in {ARCHIVE_DIR}/")
+    parser.add_argument("--db", default=DB_FILE, help=f"SQLite database (default {DB_FILE})")
+    parser.add_argument("--repos", default=REPO_FILE, help=f"CSV of target repos (default {REPO_FILE})")
+    parser.add_argument("--since", default=TIME_START, help=f"only PRs created from this time (default {TIME_START})")
+    parser.add_argument("--until", default=TIME_END, help=f"only PRs created up to this time (default {TIME_END})")
+    parser.add_argument("--profile", action="store_true",
+                        help="profile fetch and DB writer work with cProfile into profile_<timestamp>.prof")
+    parser.add_argument("--no-data-log", action="store_true",
+                        help="do not write every stored PR and issue to data_log_<timestamp>.txt")
+    parser.add_argument("--shards", type=int,
+                        help="split the repos over this many processes, one token each from GITHUB_TOKENS, "
+                             f"into {SHARD_DIR}/shard-NN/ and merge them into --db")
+    parser.add_argument("--shard", metavar="I/N",
+                        help=f"collect only shard I of N into {SHARD_DIR}/shard-I/ (one machine's part of a sharded run)")
+
+def config_from_args(args):
+    return CollectorConfig(
+        repo_file=args.repos, db_file=args.db, time_start=args.since, time_end=args.until,
+        workers=args.workers, backend=args.backend, http_cache=not args.no_http_cache,
+        archive=not args.no_archive, data_log=not args.no_data_log, profile=args.profile,
+    )
+
+def collect_from_args(args):
+    config = config_from_args(args)
+    if args.shard:
+        index, shards = (int(x) for x in args.shard.split("/"))
+        return collect(shard_config(config, shards, index))
+    if args.shards:
+        return collect_sharded(config, args.shards)
+    return collect(config)
+
+def main():
+    parser = argparse.ArgumentParser(description="Fetch 2025 pull requests for repos.csv into SQLite")
+    add_arguments(parser)
+    parser.add_argument("--resolve-issues", action="store_true",
+                        help="only resolve linked issue titles for PRs already in the DB")
+    parser.add_argument("--merge-shards", action="store_true",
+                        help=f"only merge the shard DBs under {SHARD_DIR}/ into --db")
+    parser.add_argument("--replay", action="store_true",
+                        help=f"rebuild the DB from the raw pages in {ARCHIVE_DIR}/ without calling the API")
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+    load_dotenv()
+    config = config_from_args(args)
+    if args.replay:
+        replay(config)
+        return
+    if args.resolve_issues:
+        resolve_issues(config)
+        return
+    if args.merge_shards:
+        merge_shards(config.db_file, shard_db_files(config.db_file))
+        return
+
+    failed = collect_from_args(args)
+    if failed:
+        print(f"\n{len(failed)} repositories failed: {', '.join(failed)}. Rerun to resume them.")
+    else:
+        print("\nAll repositories processed.")
 
 if __name__ == "__main__":
     main()
@@ -1,10 +1,14 @@
 import sqlite3
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-from jinja2 import Environment, FileSystemLoader
-import matplotlib.colors as mcolors
+import argparse
+import json
+import hashlib
 import os
+import glob
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+import numpy as np
+import pandas as pd
 
 # Configuration
 DB_PATH = "pull_requests_2025.db"
@@ -13,166 +17,625 @@ TEMPLATE_DIR = "templates"
 TEMPLATE_FILE = "report_template.html"
 TIME_START = "2025-04-17T00:00:00Z"
 TIME_END = "2025-05-21T23:59:59Z"
+RENDER_WORKERS = os.cpu_count() or 1
+REPORT_CHUNK_SIZE = 50000
+REPO_CATEGORIES = ["First", "Second", "Third+"]
+TOP_REPO_PAIRS = 15
+OUTPUT_FORMATS = ("png", "svg", "vega")
+VEGA_LITE_SCHEMA = "https://vega.github.io/schema/vega-lite/v5.json"
+BUILD_MANIFEST = "build_manifest.json"
+# Bump when the chart drawing code changes so cached outputs are rebuilt
+RENDER_VERSION = 1
 
-os.makedirs(OUTPUT_DIR, exist_ok=True)
-
-# Load database
-conn = sqlite3.connect(DB_PATH)
-df = pd.read_sql_query("SELECT * FROM pull_requests", conn, parse_dates=["created_at", "updated_at", "closed_at", "merged_at"])
-df = df[(df["created_at"] >= TIME_START) & (df["created_at"] <= TIME_END)]
-
-# Filter qualified users
-user_repo_counts = df.groupby("user_login")["repo"].nunique()
-qualified_users = user_repo_counts[user_repo_counts >= 2].index
-df_qualified = df[df["user_login"].isin(qualified_users)]
-
-# Generate repo-first categorization
-repo_firsts = df_qualified.groupby(['user_login', 'repo'])['created_at'].min().reset_index()
-repo_firsts = repo_firsts.sort_values(by=['user_login', 'created_at'])
-repo_firsts['repo_index'] = repo_firsts.groupby('user_login').cumcount() + 1
-repo_firsts['repo_category'] = repo_firsts['repo_index'].apply(lambda i: "First" if i == 1 else "Second" if i == 2 else "Third+")
-
-# Chart data
-first_repo = repo_firsts[repo_firsts['repo_category'] == 'First']['repo'].value_counts()
-second_repo = repo_firsts[repo_firsts['repo_category'] == 'Second']['repo'].value_counts()
-third_plus_repo = repo_firsts[repo_firsts['repo_category'] == 'Third+']['repo'].value_counts()
-all_prs_repo_counts = df_qualified["repo"].value_counts()
-repo_hits = df_qualified.groupby(["repo", "user_login"]).size().reset_index(name="count")
-repo_hits = repo_hits.groupby("repo")["user_login"].nunique()
-heatmap_data = df_qualified.copy()
-heatmap_data["date"] = heatmap_data["created_at"].dt.date
-all_dates = pd.date_range(start=TIME_START, end=TIME_END).date
-
-def get_heat_series(df, user_repo_map, category):
-    user_repo_map = user_repo_map[user_repo_map["repo_category"] == category]
-    merged = df.merge(user_repo_map[["user_login", "repo"]], on=["user_login", "repo"])
-    counts = merged["date"].value_counts().reindex(all_dates, fill_value=0)
-    return counts
-
-heat_first = get_heat_series(heatmap_data, repo_firsts, "First")
-heat_second = get_heat_series(heatmap_data, repo_firsts, "Second")
-heat_third_plus = get_heat_series(heatmap_data, repo_firsts, "Third+")
-heat_all = heatmap_data["date"].value_counts().reindex(all_dates, fill_value=0)
-repos_per_user = df_qualified.groupby("user_login")["repo"].nunique().value_counts().sort_index()
-state_counts = df_qualified["state"].value_counts()
-
-# Linked issues
-df_issues = pd.read_sql_query("SELECT * FROM pr_issues", conn)
-df["linked_issue"] = df["id"].isin(df_issues["pr_id"].unique())
-issue_counts = df["linked_issue"].value_counts().rename(index={True: "Linked to Issue", False: "No Linked Issue"})
-
-# Get evenly spaced repo colors by permuting index positions
-all_repos = sorted(set(first_repo.index).union(second_repo.index).union(third_plus_repo.index).union(repo_hits.index))
-n = len(all_repos)
-cmap = plt.colormaps.get_cmap("tab20")
-
-# Visually space colors using a stride pattern (e.g., i*3 % n)
-spaced_indices = [(i * 3) % n for i in range(n)]
-repo_colors = {
-    repo: mcolors.to_hex(cmap(spaced_i / n))
-    for repo, spaced_i in zip(all_repos, spaced_indices)
-}
+@dataclass
+class ReportConfig:
+    # One report build; main() builds it from the command line
+    db_path: str = DB_PATH
+    output_dir: str = OUTPUT_DIR
+    template_dir: str = TEMPLATE_DIR
+    time_start: str = TIME_START
+    time_end: str = TIME_END
+    format: str = "png"
+    workers: int = RENDER_WORKERS
+    streaming: bool = False
+    force: bool = False
+    parquet_dir: str = None  # read export_parquet.py output with DuckDB instead of SQLite
+
+def import_matplotlib():
+    # matplotlib and seaborn are most of this module's import time and only
+    # chart drawing needs them, so they load on first use
+    import matplotlib
+    matplotlib.use("Agg")  # never touch a GUI backend, also inside render workers
+    return matplotlib
+
+def has_summary_tables(conn):
+    cur = conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name IN ('user_repo_daily', 'repo_daily_counts')")
+    return cur.fetchone()[0] == 2
+
+def load_daily_from_summaries(conn, time_start=TIME_START, time_end=TIME_END):
+    # The fetcher keeps these tables current; the window is whole days, so
+    # filtering on day matches filtering on created_at
+    daily = pd.read_sql_query(
+        "SELECT user_login, repo, day, pr_count, open_count, first_pr_at FROM user_repo_daily WHERE day BETWEEN ? AND ?",
+        conn, params=(time_start[:10], time_end[:10]),
+    )
+    linked = conn.execute(
+        "SELECT COALESCE(SUM(pr_count), 0), COALESCE(SUM(linked_count), 0) FROM repo_daily_counts WHERE day BETWEEN ? AND ?",
+        (time_start[:10], time_end[:10]),
+    ).fetchone()
+    return daily, linked
+
+def aggregate_chunk(chunk):
+    # Low-cardinality text columns as categoricals so a chunk costs codes, not strings
+    chunk = chunk.astype({"user_login": "category", "repo": "category", "state": "category"})
+    chunk["day"] = chunk["created_at"].str[:10].astype("category")
+    chunk["is_open"] = chunk["state"] == "open"
+    # min() over string groups is a slow path; datetimes reduce natively
+    chunk["created_at"] = pd.to_datetime(chunk["created_at"])
+    return chunk.groupby(["user_login", "repo", "day"], observed=True).agg(
+        pr_count=("is_open", "size"), open_count=("is_open", "sum"), first_pr_at=("created_at", "min"),
+    )
+
+def merge_partials(partials):
+    merged = pd.concat(partials)
+    return merged.groupby(level=["user_login", "repo", "day"], observed=True).agg(
+        pr_count=("pr_count", "sum"), open_count=("open_count", "sum"), first_pr_at=("first_pr_at", "min"),
+    )
+
+def load_daily_from_pull_requests(conn, chunk_size=REPORT_CHUNK_SIZE, time_start=TIME_START, time_end=TIME_END):
+    # Aggregate straight from pull_requests, chunk by chunk: only the needed
+    # columns, window filtered in SQL (ISO-8601 UTC strings compare in time
+    # order), so memory grows with distinct (user, repo, day), not PR count
+    query = "SELECT user_login, repo, state, created_at FROM pull_requests WHERE created_at BETWEEN ? AND ?"
+    partials, pending_rows = [], 0
+    for chunk in pd.read_sql_query(query, conn, params=(time_start, time_end), chunksize=chunk_size):
+        partials.append(aggregate_chunk(chunk))
+        pending_rows += len(partials[-1])
+        if pending_rows > chunk_size and len(partials) > 1:
+            partials = [merge_partials(partials)]
+            pending_rows = len(partials[0])
+
+    columns = ["user_login", "repo", "day", "pr_count", "open_count", "first_pr_at"]
+    if partials:
+        daily = merge_partials(partials).reset_index()
+        daily = daily.astype({"user_login": str, "repo": str, "day": str})
+    else:
+        daily = pd.DataFrame(columns=columns)
+
+    linked = conn.execute(
+        """
+        SELECT COUNT(*), COALESCE(SUM(EXISTS (
+            SELECT 1 FROM pr_issues i WHERE i.pr_id = p.id AND i.issue_title IS NOT NULL
+        )), 0)
+        FROM pull_requests p WHERE p.created_at BETWEEN ? AND ?
+        """,
+        (time_start, time_end),
+    ).fetchone()
+    return daily[columns], linked
+
+def parquet_files(parquet_dir, table, time_start, time_end):
+    # Only the month partitions that overlap the window
+    months = pd.period_range(time_start[:7], time_end[:7], freq="M").strftime("%Y-%m")
+    return sorted(f for month in months
+                  for f in glob.glob(os.path.join(parquet_dir, table, "repo=*", f"month={month}", "*.parquet")))
+
+def load_daily_from_parquet(parquet_dir, time_start=TIME_START, time_end=TIME_END):
+    # Same frame as load_daily(), computed by DuckDB over the Parquet export:
+    # multi-threaded columnar scans, and only users with PRs to 2+ repos come back
+    import duckdb
+    columns = ["user_login", "repo", "day", "pr_count", "open_count", "first_pr_at"]
+    pr_files = parquet_files(parquet_dir, "pull_requests", time_start, time_end)
+    if not pr_files:
+        return pd.DataFrame(columns=columns), (0, 0)
+    issue_files = parquet_files(parquet_dir, "pr_issues", time_start, time_end)
+    # Parquet times are naive UTC
+    window = [pd.Timestamp(t).tz_convert(None).to_pydatetime() for t in (time_start, time_end)]
+    prs = """
+        prs AS (
+            SELECT id, user_login, repo, state, created_at
+            FROM read_parquet($pr_files, hive_partitioning = false)
+            WHERE created_at BETWEEN $start AND $end
+        )
+    """
+    params = {"pr_files": pr_files, "start": window[0], "end": window[1]}
+    con = duckdb.connect()
+    daily = con.execute(f"""
+        WITH {prs}, qualified AS (
+            SELECT user_login FROM prs GROUP BY user_login HAVING COUNT(DISTINCT repo) >= 2
+        )
+        SELECT user_login, repo, strftime(created_at, '%Y-%m-%d') AS day, COUNT(*) AS pr_count,
+               SUM(CAST(state = 'open' AS INTEGER)) AS open_count,
+               strftime(MIN(created_at), '%Y-%m-%dT%H:%M:%SZ') AS first_pr_at
+        FROM prs JOIN qualified USING (user_login)
+        GROUP BY user_login, repo, day
+    """, params).df()
+    if issue_files:
+        linked = con.execute(f"""
+            WITH {prs}
+            SELECT COUNT(*), COUNT(*) FILTER (WHERE id IN (
+                SELECT pr_id FROM read_parquet($issue_files, hive_partitioning = false) WHERE issue_title IS NOT NULL
+            )) FROM prs
+        """, {**params, "issue_files": issue_files}).fetchone()
+    else:
+        linked = (con.execute(f"WITH {prs} SELECT COUNT(*) FROM prs", params).fetchone()[0], 0)
+    con.close()
+    return daily[columns], linked
+
+def load_daily(conn, streaming=False, time_start=TIME_START, time_end=TIME_END):
+    # One row per (user, repo, day) with PR counts, plus linked issue totals.
+    # Without the summary tables (older DBs, or --streaming) aggregate pull_requests directly;
+    # the summaries are per day, so a window that starts or ends mid-day needs pull_requests too
+    whole_days = time_start[10:] == "T00:00:00Z" and time_end[10:] == "T23:59:59Z"
+    if has_summary_tables(conn) and whole_days and not streaming:
+        return load_daily_from_summaries(conn, time_start, time_end)
+    return load_daily_from_pull_requests(conn, time_start=time_start, time_end=time_end)
+
+def contribution_order(daily):
+    # Which of the user's repos this was, by time of the user's first PR there
+    repo_firsts = daily.groupby(['user_login', 'repo'], observed=True)['first_pr_at'].min().reset_index(name='created_at')
+    repo_firsts = repo_firsts.sort_values(by=['user_login', 'created_at'])
+    repo_firsts['repo_index'] = repo_firsts.groupby('user_login', observed=True).cumcount() + 1
+    index = repo_firsts['repo_index'].to_numpy()
+    repo_firsts['repo_category'] = pd.Categorical(
+        np.select([index == 1, index == 2], ["First", "Second"], "Third+"), categories=REPO_CATEGORIES,
+    )
+    return repo_firsts
+
+def heat_by_category(daily, repo_firsts, all_dates):
+    # One join and one pivot: a (date x category) table of PR counts over the whole window
+    merged = daily[["user_login", "repo", "date", "pr_count"]].merge(
+        repo_firsts[["user_login", "repo", "repo_category"]], on=["user_login", "repo"],
+    )
+    heat = merged.pivot_table(index="date", columns="repo_category", values="pr_count",
+                              aggfunc="sum", fill_value=0, observed=False)
+    heat = heat.reindex(index=all_dates, columns=REPO_CATEGORIES, fill_value=0)
+    heat["All"] = heat.sum(axis=1)
+    return heat
+
+def build_chart_data(daily, linked, time_start=TIME_START, time_end=TIME_END):
+    window_pr_count, linked_pr_count = (int(x) for x in linked)
+    daily["date"] = pd.to_datetime(daily["day"]).dt.date
+    daily["first_pr_at"] = pd.to_datetime(daily["first_pr_at"])
+
+    # Filter qualified users
+    user_repo_counts = daily.groupby("user_login")["repo"].nunique()
+    qualified_users = user_repo_counts[user_repo_counts >= 2].index
+    daily_qualified = daily[daily["user_login"].isin(qualified_users)]
+
+    # Generate repo-first categorization
+    repo_firsts = contribution_order(daily_qualified)
+    repos_by_category = {
+        category: group["repo"].value_counts()
+        for category, group in repo_firsts.groupby("repo_category", observed=False)
+    }
+
+    # Chart data
+    all_dates = pd.date_range(start=time_start, end=time_end).date
+    heat = heat_by_category(daily_qualified, repo_firsts, all_dates)
+    open_prs = int(daily_qualified["open_count"].sum())
+    state_counts = pd.Series({"closed": int(daily_qualified["pr_count"].sum()) - open_prs, "open": open_prs})
+    issue_counts = pd.Series({"No Linked Issue": window_pr_count - linked_pr_count, "Linked to Issue": linked_pr_count})
+    return {
+        "qualified_users": qualified_users,
+        "first_repo": repos_by_category["First"],
+        "second_repo": repos_by_category["Second"],
+        "third_plus_repo": repos_by_category["Third+"],
+        "all_prs_repo_counts": daily_qualified.groupby("repo")["pr_count"].sum().sort_values(ascending=False),
+        "repo_hits": daily_qualified.groupby("repo")["user_login"].nunique(),
+        "heat_first": heat["First"],
+        "heat_second": heat["Second"],
+        "heat_third_plus": heat["Third+"],
+        "heat_all": heat["All"],
+        "repos_per_user": daily_qualified.groupby("user_login")["repo"].nunique().value_counts().sort_index(),
+        "state_counts": state_counts[state_counts > 0].sort_values(ascending=False),
+        "issue_counts": issue_counts[issue_counts > 0].sort_values(ascending=False),
+    }
+
+def synthetic_daily(users, repos, days, seed=0):
+    # A random (user, repo, day) frame shaped like load_daily() output
+    rng = np.random.default_rng(seed)
+    rows = users * 8
+    start = pd.Timestamp(TIME_START[:10])
+    first_pr_at = start + pd.to_timedelta(rng.integers(0, days * 86400, rows), unit="s")
+    daily = pd.DataFrame({
+        "user_login": [f"user{i}" for i in rng.integers(0, users, rows)],
+        "repo": [f"org/repo{i}" for i in rng.integers(0, repos, rows)],
+        "day": first_pr_at.strftime("%Y-%m-%d"),
+        "first_pr_at": first_pr_at.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "pr_count": rng.integers(1, 4, rows),
+    })
+    daily = daily.groupby(["user_login", "repo", "day"]).agg(
+        pr_count=("pr_count", "sum"), first_pr_at=("first_pr_at", "min"),
+    ).reset_index()
+    daily["open_count"] = daily["pr_count"] // 2
+    return daily
+
+def benchmark(users=20000, repos=500, days=365, repeat=3):
+    daily = synthetic_daily(users, repos, days)
+    time_end = (pd.Timestamp(TIME_START[:10]) + pd.Timedelta(days=days - 1)).strftime("%Y-%m-%dT23:59:59Z")
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        build_chart_data(daily.copy(), (int(daily["pr_count"].sum()), 0), TIME_START, time_end)
+        timings.append(time.perf_counter() - started)
+    print(f"build_chart_data: {len(daily)} daily rows, {users} users, {repos} repos, {days} days: "
+          f"best {min(timings):.3f}s of {repeat}")
+
+def has_correlation_tables(conn):
+    cur = conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name IN ('repo_similarity', 'account_similarity')")
+    return cur.fetchone()[0] == 2
+
+def correlation_window(conn):
+    # (time_start, time_end) correlate_accounts.py last ran for; None before it recorded one
+    cur = conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = 'correlation_window'")
+    if not cur.fetchone()[0]:
+        return None
+    return conn.execute("SELECT time_start, time_end FROM correlation_window").fetchone()
+
+def load_correlations(conn, time_start=TIME_START, time_end=TIME_END):
+    # Output of correlate_accounts.py, if it has been run for the report's window;
+    # results for another window would not match the other charts, so they are left out
+    if not has_correlation_tables(conn):
+        return {}
+    window = correlation_window(conn)
+    if window != (time_start, time_end):
+        print(f"Skipping correlation charts: computed for {' to '.join(window) if window else 'an unknown window'}, "
+              f"run correlate_accounts.py --since {time_start} --until {time_end} to include them")
+        return {}
+    pairs = pd.read_sql_query(
+        "SELECT repo_a, repo_b, jaccard FROM repo_similarity WHERE shared_users >= 2 ORDER BY jaccard DESC, shared_users DESC LIMIT ?",
+        conn, params=(TOP_REPO_PAIRS,),
+    )
+    scores = pd.read_sql_query("SELECT score FROM account_similarity WHERE rank = 1", conn)["score"]
+    bins = np.linspace(0, 1, 11)
+    labels = [f"{lo:.1f}-{hi:.1f}" for lo, hi in zip(bins[:-1], bins[1:])]
+    best = pd.cut(scores, bins, labels=labels, include_lowest=True).value_counts().reindex(labels, fill_value=0)
+    return {
+        "repo_pairs": pd.Series(pairs["jaccard"].round(3).to_numpy(), index=pairs["repo_a"] + " + " + pairs["repo_b"]),
+        "best_match_scores": best,
+    }
+
+def get_repo_colors(data):
+    matplotlib = import_matplotlib()
+    from matplotlib import colors as mcolors
+    # Get evenly spaced repo colors by permuting index positions
+    all_repos = sorted(set(data["first_repo"].index).union(data["second_repo"].index)
+                       .union(data["third_plus_repo"].index).union(data["repo_hits"].index))
+    n = len(all_repos)
+    cmap = matplotlib.colormaps.get_cmap("tab20")
+
+    # Visually space colors using a stride pattern (e.g., i*3 % n)
+    spaced_indices = [(i * 3) % n for i in range(n)]
+    return {
+        repo: mcolors.to_hex(cmap(spaced_i / n))
+        for repo, spaced_i in zip(all_repos, spaced_indices)
+    }
 
 
 
-def save_pie(data, title, filename, label=True, full_repo_order=None, use_repo_colors=True, offset=0):
+def pie_data(data, full_repo_order=None):
     if full_repo_order is not None:
         data = data.reindex(full_repo_order, fill_value=0)
         data = data[data > 0]
+    return data
 
-    if use_repo_colors:
-        colors = [repo_colors.get(repo, "#444") for repo in data.index]
-    else:
-        cmap = plt.colormaps.get_cmap("tab10")
-        colors = [mcolors.to_hex(cmap(i / len(data))) for i in range(len(data))]
+def pie_colors(data, repo_colors=None):
+    if repo_colors is not None:
+        return [repo_colors.get(repo, "#444") for repo in data.index]
+    matplotlib = import_matplotlib()
+    from matplotlib import colors as mcolors
+    cmap = matplotlib.colormaps.get_cmap("tab10")
+    return [mcolors.to_hex(cmap(i / len(data))) for i in range(len(data))]
+
+def save_figure(fig, path):
+    # Fixed metadata so unchanged charts render to identical files
+    fmt = os.path.splitext(path)[1][1:]
+    metadata = {"Date": None} if fmt == "svg" else None
+    fig.savefig(path, format=fmt, facecolor="#121212", metadata=metadata)
 
-    plt.figure(figsize=(8, 8))
-    plt.pie(
+def save_pie(path, data, title, label=True, full_repo_order=None, repo_colors=None, offset=0):
+    from matplotlib.figure import Figure
+    data = pie_data(data, full_repo_order)
+    fig = Figure(figsize=(8, 8))
+    ax = fig.subplots()
+    ax.pie(
         data,
         labels=data.index if label else None,
         autopct="%1.1f%%" if label else None,
-        colors=colors,
+        colors=pie_colors(data, repo_colors),
         textprops={"color": "white"},
         startangle=140+offset
     )
-    plt.title(title, color="white")
-    plt.axis("equal")
-    plt.gca().set_facecolor("#121212")
-    plt.tight_layout()
-    plt.savefig(os.path.join(OUTPUT_DIR, filename), facecolor="#121212")
-    plt.close()
+    ax.set_title(title, color="white")
+    ax.axis("equal")
+    ax.set_facecolor("#121212")
+    fig.tight_layout()
+    save_figure(fig, path)
 
 
 
-def save_heatmap(series, title, filename):
-    plt.figure(figsize=(12, 2))
-    ax = sns.heatmap([series.values], cmap="inferno", cbar=True, xticklabels=30)
-    plt.title(title, color="white")
+def save_heatmap(path, series, title):
+    from matplotlib.figure import Figure
+    import seaborn as sns
+    fig = Figure(figsize=(12, 2))
+    ax = fig.subplots()
+    sns.heatmap([series.values], cmap="inferno", cbar=True, xticklabels=30, ax=ax)
+    ax.set_title(title, color="white")
     ax.set_facecolor("#121212")
-    plt.xticks(color="white")
-    plt.yticks(color="white")
-    plt.tight_layout()
-    plt.savefig(os.path.join(OUTPUT_DIR, filename), facecolor="#121212")
-    plt.close()
-
-def save_bar(series, title, filename):
-    plt.figure(figsize=(10, 6))
-    ax = series.plot(kind='bar', color='skyblue')
-    plt.title(title, color="white")
-    plt.xlabel("Repos Contributed To", color="white")
-    plt.ylabel("Number of Users", color="white")
-    plt.xticks(color="white")
-    plt.yticks(color="white")
+    ax.tick_params(labelcolor="white")
+    fig.tight_layout()
+    save_figure(fig, path)
+
+def save_bar(path, series, title, xlabel="Repos Contributed To", ylabel="Number of Users", horizontal=False):
+    from matplotlib.figure import Figure
+    fig = Figure(figsize=(10, 6))
+    ax = fig.subplots()
+    series.plot(kind='barh' if horizontal else 'bar', color='skyblue', ax=ax)
+    if horizontal:
+        ax.invert_yaxis()  # largest first, reading down
+    ax.set_title(title, color="white")
+    ax.set_xlabel(ylabel if horizontal else xlabel, color="white")
+    ax.set_ylabel(xlabel if horizontal else ylabel, color="white")
+    ax.tick_params(labelcolor="white")
     ax.set_facecolor("#121212")
-    plt.gcf().patch.set_facecolor("#121212")
-    plt.tight_layout()
-    plt.savefig(os.path.join(OUTPUT_DIR, filename), facecolor="#121212")
-    plt.close()
-
-# Save charts
-# Use repo_hits.index as master order
-master_repo_order = repo_hits.index.tolist()
-save_pie(repo_hits, "Repos Hit (Unique Contributors)", "pie_repo_hits.png", label=True)
-save_pie(first_repo, "First PR", "pie_first_repo.png", label=False, full_repo_order=master_repo_order)
-save_pie(second_repo, "Second PR", "pie_second_repo.png", label=False, full_repo_order=master_repo_order)
-save_pie(third_plus_repo, "Third+ PR", "pie_third_plus_repo.png", full_repo_order=master_repo_order)
-save_pie(all_prs_repo_counts, "All PRs by Repo", "pie_all_prs_repo.png", full_repo_order=master_repo_order)
-save_pie(state_counts, "PR State Distribution", "pie_state_distribution.png", use_repo_colors=False, offset=30)
-save_pie(issue_counts, "PRs With vs Without Linked Issues", "pie_linked_issues.png", use_repo_colors=False)
-
-save_heatmap(heat_first, "Heatmap: First PR Dates", "heat_first_pr.png")
-save_heatmap(heat_second, "Heatmap: Second PR Dates", "heat_second_pr.png")
-save_heatmap(heat_third_plus, "Heatmap: Third+ PR Dates", "heat_third_plus_pr.png")
-save_heatmap(heat_all, "Heatmap: All PR Dates", "heat_all_pr.png")
-save_bar(repos_per_user, "Number of Repos Each User Contributed To", "bar_repos_per_user.png")
-
-# Render HTML
-env = Environment(loader=FileSystemLoader(TEMPLATE_DIR))
-template = env.get_template(TEMPLATE_FILE)
-summary = f"{len(qualified_users)} accounts made PRs to at least 2 different repos between {TIME_START[:10]} and {TIME_END[:10]}."
-charts = [
-    {"filename": "pie_repo_hits.png", "title": "Repos Hit (Unique Contributors)"},
-    {
-        "title": "PR Order Breakdown (still unique contributors)",
-        "layout": "row",
-        "subcharts": [
-            {"filename": "pie_first_repo.png", "title": "First PR"},
-            {"filename": "pie_second_repo.png", "title": "Second PR"},
-            {"filename": "pie_third_plus_repo.png", "title": "Third+ PR"},
-        ]
+    fig.patch.set_facecolor("#121212")
+    fig.tight_layout()
+    save_figure(fig, path)
+
+# Vega-Lite equivalents: the page embeds the aggregated numbers and the browser draws them
+VEGA_CONFIG = {
+    "background": "#121212",
+    "config": {
+        "title": {"color": "white"},
+        "axis": {"labelColor": "white", "titleColor": "white", "gridColor": "#333"},
+        "legend": {"labelColor": "white", "titleColor": "white"},
+        "view": {"stroke": None},
     },
-    {"filename": "pie_all_prs_repo.png", "title": "All PRs by Repo"},
-    {"filename": "pie_state_distribution.png", "title": "PR State Distribution"},
-    {"filename": "pie_linked_issues.png", "title": "PRs With vs Without Linked Issues"},
-    {"filename": "heat_first_pr.png", "title": "Heatmap: First PR Dates"},
-    {"filename": "heat_second_pr.png", "title": "Heatmap: Second PR Dates"},
-    {"filename": "heat_third_plus_pr.png", "title": "Heatmap: Third+ PR Dates"},
-    {"filename": "heat_all_pr.png", "title": "Heatmap: All PR Dates"},
-    {"filename": "bar_repos_per_user.png", "title": "Number of Repos Each User Contributed To"},
+}
+
+def vega_pie(data, title, label=True, full_repo_order=None, repo_colors=None, offset=0):
+    data = pie_data(data, full_repo_order)
+    return {
+        "$schema": VEGA_LITE_SCHEMA, **VEGA_CONFIG,
+        "title": title, "width": 360, "height": 360,
+        "data": {"values": [{"label": str(k), "value": int(v)} for k, v in data.items()]},
+        "mark": {"type": "arc", "tooltip": True},
+        "encoding": {
+            "theta": {"field": "value", "type": "quantitative", "stack": True},
+            "color": {
+                "field": "label", "type": "nominal",
+                "scale": {"domain": [str(k) for k in data.index], "range": pie_colors(data, repo_colors)},
+                "legend": {"title": None} if label else None,
+            },
+            "order": {"field": "value", "type": "quantitative", "sort": "descending"},
+        },
+    }
+
+def vega_heatmap(series, title):
+    return {
+        "$schema": VEGA_LITE_SCHEMA, **VEGA_CONFIG,
+        "title": title, "width": 900, "height": 40,
+        "data": {"values": [{"date": str(k), "count": int(v)} for k, v in series.items()]},
+        "mark": {"type": "rect", "tooltip": True},
+        "encoding": {
+            "x": {"field": "date", "type": "ordinal", "title": None, "axis": {"labelAngle": -45}},
+            "color": {"field": "count", "type": "quantitative", "scale": {"scheme": "inferno"}},
+        },
+    }
+
+def vega_bar(series, title, xlabel="Repos Contributed To", ylabel="Number of Users", horizontal=False):
+    category = {"field": "label", "type": "ordinal", "title": xlabel, "sort": None}
+    value = {"field": "value", "type": "quantitative", "title": ylabel}
+    return {
+        "$schema": VEGA_LITE_SCHEMA, **VEGA_CONFIG,
+        "title": title, "width": 600, "height": 320,
+        "data": {"values": [{"label": str(k), "value": v.item() if hasattr(v, "item") else v} for k, v in series.items()]},
+        "mark": {"type": "bar", "color": "skyblue", "tooltip": True},
+        "encoding": {"x": value, "y": category} if horizontal else {"x": category, "y": value},
+    }
+
+RENDERERS = {
+    "pie": (save_pie, vega_pie),
+    "heatmap": (save_heatmap, vega_heatmap),
+    "bar": (save_bar, vega_bar),
+}
+
+def chart_jobs(data):
+    # (name, kind, title, series, style) for every chart on the page
+    repo_colors = get_repo_colors(data)
+    # Use repo_hits.index as master order
+    master_repo_order = data["repo_hits"].index.tolist()
+    repo_style = {"repo_colors": repo_colors, "full_repo_order": master_repo_order}
+    return [
+        ("pie_repo_hits", "pie", "Repos Hit (Unique Contributors)", data["repo_hits"], {"label": True, "repo_colors": repo_colors}),
+        ("pie_first_repo", "pie", "First PR", data["first_repo"], {"label": False, **repo_style}),
+        ("pie_second_repo", "pie", "Second PR", data["second_repo"], {"label": False, **repo_style}),
+        ("pie_third_plus_repo", "pie", "Third+ PR", data["third_plus_repo"], repo_style),
+        ("pie_all_prs_repo", "pie", "All PRs by Repo", data["all_prs_repo_counts"], repo_style),
+        ("pie_state_distribution", "pie", "PR State Distribution", data["state_counts"], {"offset": 30}),
+        ("pie_linked_issues", "pie", "PRs With vs Without Linked Issues", data["issue_counts"], {}),
+        ("heat_first_pr", "heatmap", "Heatmap: First PR Dates", data["heat_first"], {}),
+        ("heat_second_pr", "heatmap", "Heatmap: Second PR Dates", data["heat_second"], {}),
+        ("heat_third_plus_pr", "heatmap", "Heatmap: Third+ PR Dates", data["heat_third_plus"], {}),
+        ("heat_all_pr", "heatmap", "Heatmap: All PR Dates", data["heat_all"], {}),
+        ("bar_repos_per_user", "bar", "Number of Repos Each User Contributed To", data["repos_per_user"], {}),
+    ] + correlation_jobs(data)
+
+def correlation_jobs(data):
+    # Only when correlate_accounts.py has been run against the DB for this window
+    if "repo_pairs" not in data:
+        return []
+    return [
+        ("bar_repo_pairs", "bar", "Most Correlated Repo Pairs (Jaccard, shared contributors)", data["repo_pairs"],
+         {"xlabel": "Repo Pair", "ylabel": "Jaccard Similarity", "horizontal": True}),
+        ("bar_best_match_scores", "bar", "Similarity of Each Account to Its Closest Account", data["best_match_scores"],
+         {"xlabel": "Best-Match Score (repo overlap + PR timing)", "ylabel": "Number of Users"}),
+    ]
+
+def render_chart(job, fmt, output_dir):
+    # Runs in a worker process; each chart builds its own Figure, no pyplot state
+    name, kind, title, series, style = job
+    save, to_vega = RENDERERS[kind]
+    if fmt == "vega":
+        # Keep "</" out of the inline <script> block
+        return name, {"spec": json.dumps(to_vega(series, title, **style)).replace("</", "<\\/")}
+    filename = f"{name}.{fmt}"
+    import_matplotlib()
+    save(os.path.join(output_dir, filename), series, title, **style)
+    return name, {"filename": filename}
+
+def chart_hash(job, fmt):
+    # Input series + style + output format; equal hashes render to equal files
+    name, kind, title, series, style = job
+    payload = {
+        "version": RENDER_VERSION, "name": name, "kind": kind, "title": title, "format": fmt,
+        "series": [[str(k), v.item() if hasattr(v, "item") else v] for k, v in series.items()],
+        "style": style,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+def load_manifest(output_dir):
+    path = os.path.join(output_dir, BUILD_MANIFEST)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def save_manifest(output_dir, manifest):
+    write_if_changed(os.path.join(output_dir, BUILD_MANIFEST), json.dumps(manifest, indent=2, sort_keys=True) + "\n")
+
+def write_if_changed(path, text):
+    # Leave the file (and its mtime) alone when the content is the same
+    if os.path.exists(path):
+        with open(path) as f:
+            if f.read() == text:
+                return False
+    with open(path, "w") as f:
+        f.write(text)
+    return True
+
+def render_charts(jobs, fmt, output_dir, workers, force=False):
+    manifest = load_manifest(output_dir)
+    hashes = {job[0]: chart_hash(job, fmt) for job in jobs}
+    rendered, stale = {}, []
+    for job in jobs:
+        name = job[0]
+        filename = f"{name}.{fmt}"
+        cached = manifest.get(name)
+        if (not force and fmt != "vega" and cached and cached["hash"] == hashes[name]
+                and cached["filename"] == filename and os.path.exists(os.path.join(output_dir, filename))):
+            rendered[name] = {"filename": filename}
+        else:
+            stale.append(job)
+
+    if workers <= 1 or fmt == "vega" or len(stale) <= 1:
+        rendered.update(render_chart(job, fmt, output_dir) for job in stale)
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(stale))) as pool:
+            rendered.update(pool.map(render_chart, stale, [fmt] * len(stale), [output_dir] * len(stale)))
+
+    if fmt != "vega":
+        for job in jobs:
+            manifest[job[0]] = {"hash": hashes[job[0]], "filename": f"{job[0]}.{fmt}"}
+        save_manifest(output_dir, manifest)
+    print(f"Charts: {len(stale)} rendered, {len(jobs) - len(stale)} unchanged")
+    return rendered
+
+# Page layout; a tuple is a titled row of charts
+PAGE_LAYOUT = [
+    "pie_repo_hits",
+    ("PR Order Breakdown (still unique contributors)", ["pie_first_repo", "pie_second_repo", "pie_third_plus_repo"]),
+    "pie_all_prs_repo",
+    "pie_state_distribution",
+    "pie_linked_issues",
+    "heat_first_pr",
+    "heat_second_pr",
+    "heat_third_plus_pr",
+    "heat_all_pr",
+    "bar_repos_per_user",
+    "bar_repo_pairs",
+    "bar_best_match_scores",
 ]
 
-html = template.render(summary=summary, charts=charts)
-with open(os.path.join(OUTPUT_DIR, "index.html"), "w") as f:
-    f.write(html)
+def page_charts(jobs, rendered):
+    titles = {job[0]: job[2] for job in jobs}
+    chart = lambda name: {"id": name, "title": titles[name], **rendered[name]}
+    charts = []
+    for entry in PAGE_LAYOUT:
+        if isinstance(entry, str) and entry not in rendered:
+            continue
+        if isinstance(entry, tuple):
+            title, names = entry
+            charts.append({"title": title, "layout": "row", "subcharts": [chart(name) for name in names]})
+        else:
+            charts.append(chart(entry))
+    return charts
+
+def write_index(summary, charts, output_dir, template_dir=TEMPLATE_DIR):
+    # Render HTML
+    from jinja2 import Environment, FileSystemLoader
+    env = Environment(loader=FileSystemLoader(template_dir))
+    template = env.get_template(TEMPLATE_FILE)
+    uses_vega = any("spec" in sub for chart in charts for sub in chart.get("subcharts", [chart]))
+    html = template.render(summary=summary, charts=charts, uses_vega=uses_vega)
+    write_if_changed(os.path.join(output_dir, "index.html"), html)
+
+
+def build_report(config):
+    # Reads config.db_path, renders the charts and writes index.html; returns the page summary line
+    os.makedirs(config.output_dir, exist_ok=True)
+    conn = sqlite3.connect(config.db_path)
+    if config.parquet_dir:
+        daily, linked = load_daily_from_parquet(config.parquet_dir, config.time_start, config.time_end)
+    else:
+        daily, linked = load_daily(conn, config.streaming, config.time_start, config.time_end)
+    data = build_chart_data(daily, linked, config.time_start, config.time_end)
+    data.update(load_correlations(conn, config.time_start, config.time_end))
+    conn.close()
+
+    jobs = chart_jobs(data)
+    rendered = render_charts(jobs, config.format, config.output_dir, config.workers, force=config.force)
+    summary = (f"{len(data['qualified_users'])} accounts made PRs to at least 2 different repos "
+               f"between {config.time_start[:10]} and {config.time_end[:10]}.")
+    write_index(summary, page_charts(jobs, rendered), config.output_dir, config.template_dir)
+    return summary
+
+def add_arguments(parser):
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default="png",
+                        help="png/svg image files, or vega to embed Vega-Lite specs in index.html (default png)")
+    parser.add_argument("--workers", type=int, default=RENDER_WORKERS,
+                        help=f"chart rendering processes (default {RENDER_WORKERS})")
+    parser.add_argument("--streaming", action="store_true",
+                        help="aggregate pull_requests in chunks instead of reading the summary tables")
+    parser.add_argument("--force", action="store_true",
+                        help=f"re-render every chart, ignoring {OUTPUT_DIR}/{BUILD_MANIFEST}")
+    parser.add_argument("--db", default=DB_PATH, help=f"SQLite database (default {DB_PATH})")
+    parser.add_argument("--output", default=OUTPUT_DIR, help=f"report directory (default {OUTPUT_DIR})")
+    parser.add_argument("--parquet", metavar="DIR",
+                        help="aggregate the export_parquet.py output in DIR with DuckDB instead of reading SQLite")
+    parser.add_argument("--since", default=TIME_START, help=f"report window start (default {TIME_START})")
+    parser.add_argument("--until", default=TIME_END, help=f"report window end (default {TIME_END})")
+
+def config_from_args(args):
+    return ReportConfig(
+        db_path=args.db, output_dir=args.output, time_start=args.since, time_end=args.until,
+        format=args.format, workers=args.workers, streaming=args.streaming, force=args.force,
+        parquet_dir=args.parquet,
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the GitHub Pages report from the PR database")
+    add_arguments(parser)
+    parser.add_argument("--benchmark", action="store_true",
+                        help="time the chart aggregation on synthetic data and exit")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark()
+        return
+
+    build_report(config_from_args(args))
+    print("✅ Report generated successfully.")
 
-print("✅ Report generated successfully.")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,323 @@
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# Local stand-in for the parts of the GitHub API the fetcher uses:
+#   GET  /repos/{owner}/{name}/pulls        (sort=created|updated, direction, page, per_page)
+#   GET  /repos/{owner}/{name}/issues[/N]
+#   POST /graphql                           (pullRequests connection, aliased issueOrPullRequest)
+# Pages are synthetic, or replayed from a PageArchive directory (--archive).
+# Every response carries X-RateLimit-* headers; an exhausted quota answers 403
+# like GitHub does, and --secondary-every injects 403 + Retry-After.
+# Point the fetcher at it with GITHUB_API_URL=http://127.0.0.1:<port>.
+
+HOST = "127.0.0.1"
+PORT = 8765
+REPO_COUNT = 10
+PRS_PER_REPO = 1000
+USER_COUNT = 500
+SPACING_SECONDS = 600  # between consecutive PRs of a repo, newest ends at LATEST_PR
+LATEST_PR = "2025-05-21T23:00:00Z"
+RATE_LIMIT = 5000
+RATE_WINDOW_SECONDS = 3600
+
+def iso(ts):
+    return datetime.fromtimestamp(ts, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+class SyntheticSource:
+    # PRs are derived from (repo, number) on demand, so millions of PRs cost no memory
+    def __init__(self, repos=REPO_COUNT, prs_per_repo=PRS_PER_REPO, users=USER_COUNT, spacing=SPACING_SECONDS):
+        self.repos = {f"bench-org/repo{i:03d}": prs_per_repo for i in range(repos)}
+        self.users = users
+        self.spacing = spacing
+        self.latest = datetime.strptime(LATEST_PR, "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=timezone.utc).timestamp()
+
+    def pr(self, repo, number):
+        n = self.repos[repo]
+        seed = int(hashlib.md5(f"{repo}#{number}".encode()).hexdigest()[:8], 16)
+        created = self.latest - (n - number) * self.spacing
+        bot = seed % 31 == 0
+        return {
+            "id": (int(repo[-3:]) + 1) * 100_000_000 + number,
+            "number": number,
+            "title": f"Synthetic PR {number}",
+            "state": "open" if seed % 4 == 0 else "closed",
+            "created_at": iso(created),
+            "updated_at": iso(created + 3600),
+            "closed_at": None if seed % 4 == 0 else iso(created + 7200),
+            "merged_at": iso(created + 7200) if seed % 4 == 1 else None,
+            "body": f"Fixes #{seed % number + 1}" if seed % 3 == 0 else None,
+            "user": {"login": "dependabot[bot]" if bot else f"user{seed % self.users}",
+                     "id": seed % self.users, "type": "Bot" if bot else "User"},
+            "head": {"ref": f"branch-{number}", "repo": {"full_name": f"fork{seed % self.users}/{repo.split('/')[1]}"}},
+        }
+
+    def rest_page(self, repo, kind, page, per_page, ascending):
+        # Numbers are created (and updated) in order, so both sorts page the same way
+        n = self.repos.get(repo)
+        if n is None:
+            return None
+        numbers = range(n, 0, -1) if not ascending else range(1, n + 1)
+        items = [self.pr(repo, k) for k in numbers[(page - 1) * per_page:page * per_page]]
+        if kind == "issues":
+            for item in items:
+                item["pull_request"] = {}
+        return items
+
+    def pull_requests(self, repo, cursor, page_size):
+        n = self.repos.get(repo)
+        if n is None:
+            return None
+        offset = int(cursor or 0)
+        nodes = [graphql_node(self.pr(repo, k)) for k in range(n - offset, max(n - offset - page_size, 0), -1)]
+        end = offset + len(nodes)
+        return {"nodes": nodes, "pageInfo": {"hasNextPage": end < n, "endCursor": str(end)}}
+
+    def issue_title(self, repo, number):
+        n = self.repos.get(repo, 0)
+        return f"Synthetic PR {number}" if 1 <= number <= n else None
+
+class ArchiveSource:
+    # Replays what the fetcher recorded under archive/ (see PageArchive)
+    def __init__(self, root):
+        self.root = root
+        index = sqlite3.connect(os.path.join(root, "index.db"))
+        self.pages = {}
+        self.titles = {}
+        for repo, kind, page, segment, offset, length in index.execute(
+                "SELECT repo, kind, page, segment, offset, length FROM pages ORDER BY id"):
+            self.pages[(repo, kind, page)] = (segment, offset, length)
+            if kind == "graphql_issue_titles":
+                for alias, node in self.read((segment, offset, length)).items():
+                    self.titles[(repo, int(alias[1:]))] = (node or {}).get("title")
+        index.close()
+        self.repos = {key[0] for key in self.pages}
+
+    def read(self, location):
+        segment, offset, length = location
+        with open(os.path.join(self.root, segment), "rb") as f:
+            f.seek(offset)
+            return json.loads(gzip.decompress(f.read(length)))["payload"]
+
+    def rest_page(self, repo, kind, page, per_page, ascending):
+        if repo not in self.repos:
+            return None
+        archived = "rest_pulls_updated" if kind == "pulls_updated" else "rest_pulls"
+        location = self.pages.get((repo, archived, str(page)))
+        items = self.read(location) if location else []
+        if kind == "issues":
+            items = [dict(item, pull_request={}) for item in items]
+        return items
+
+    def pull_requests(self, repo, cursor, page_size):
+        if repo not in self.repos:
+            return None
+        page = int(cursor or 0) + 1
+        location = self.pages.get((repo, "graphql_pulls", str(page)))
+        if location is None:
+            return {"nodes": [], "pageInfo": {"hasNextPage": False, "endCursor": None}}
+        connection = self.read(location)
+        has_next = (repo, "graphql_pulls", str(page + 1)) in self.pages
+        return {"nodes": connection["nodes"], "pageInfo": {"hasNextPage": has_next, "endCursor": str(page)}}
+
+    def issue_title(self, repo, number):
+        return self.titles.get((repo, number))
+
+def graphql_node(pr):
+    return {
+        "databaseId": pr["id"],
+        "number": pr["number"],
+        "title": pr["title"],
+        "state": pr["state"].upper(),
+        "createdAt": pr["created_at"],
+        "updatedAt": pr["updated_at"],
+        "closedAt": pr["closed_at"],
+        "mergedAt": pr["merged_at"],
+        "body": pr["body"],
+        "headRefName": pr["head"]["ref"],
+        "headRepository": {"nameWithOwner": pr["head"]["repo"]["full_name"]},
+        "author": {"__typename": pr["user"]["type"], "login": pr["user"]["login"], "databaseId": pr["user"]["id"]},
+        "closingIssuesReferences": {"nodes": []},
+    }
+
+class RateLimiter:
+    # Per-resource quota with a fixed reset, like the core / graphql buckets
+    def __init__(self, limit=RATE_LIMIT, window=RATE_WINDOW_SECONDS, secondary_every=0, retry_after=1):
+        self.limit = limit
+        self.window = window
+        self.secondary_every = secondary_every
+        self.retry_after = retry_after
+        self.lock = threading.Lock()
+        self.buckets = {}
+        self.requests = 0
+
+    def take(self, resource):
+        # Returns (headers, error) where error is None or (status, extra headers, message)
+        with self.lock:
+            now = time.time()
+            self.requests += 1
+            bucket = self.buckets.get(resource)
+            if bucket is None or bucket["reset"] <= now:
+                bucket = self.buckets[resource] = {"used": 0, "reset": int(now + self.window)}
+            if self.secondary_every and self.requests % self.secondary_every == 0:
+                return self.headers(resource, bucket), (403, {"Retry-After": str(self.retry_after)},
+                                                        "You have exceeded a secondary rate limit.")
+            if bucket["used"] >= self.limit:
+                return self.headers(resource, bucket), (403, {}, "API rate limit exceeded.")
+            bucket["used"] += 1
+            return self.headers(resource, bucket), None
+
+    def refund(self, resource):
+        # 304 Not Modified does not count against the quota
+        with self.lock:
+            self.buckets[resource]["used"] -= 1
+
+    def headers(self, resource, bucket):
+        return {
+            "X-RateLimit-Limit": str(self.limit),
+            "X-RateLimit-Remaining": str(max(self.limit - bucket["used"], 0)),
+            "X-RateLimit-Used": str(bucket["used"]),
+            "X-RateLimit-Reset": str(bucket["reset"]),
+            "X-RateLimit-Resource": resource,
+        }
+
+REPO_PATH = re.compile(r"^/repos/([^/]+/[^/]+)/(pulls|issues)(?:/(\d+))?$")
+ALIAS = re.compile(r"(i\d+): issueOrPullRequest\(number: (\d+)\)")
+
+class MockGitHubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    source = None
+    limiter = None
+    latency = 0.0
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, payload, headers):
+        body = json.dumps(payload).encode()
+        etag = '"%s"' % hashlib.md5(body).hexdigest()
+        if status == 200 and self.headers.get("If-None-Match") == etag:
+            self.limiter.refund(headers["X-RateLimit-Resource"])
+            status, body = 304, b""
+        self.send_response(status)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def handle_request(self, resource, respond):
+        if self.latency:
+            time.sleep(self.latency)
+        headers, error = self.limiter.take(resource)
+        if error:
+            status, extra, message = error
+            self.send_json(status, {"message": message}, {**headers, **extra})
+            return
+        status, payload = respond()
+        self.send_json(status, payload, headers)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        match = REPO_PATH.match(url.path)
+        if not match:
+            self.send_json(404, {"message": "Not Found"}, {})
+            return
+        repo, kind, number = match.groups()
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+
+        def respond():
+            if number:
+                title = self.source.issue_title(repo, int(number))
+                return (200, {"number": int(number), "title": title}) if title else (404, {"message": "Not Found"})
+            page_kind = "pulls_updated" if kind == "pulls" and params.get("sort") == "updated" else kind
+            items = self.source.rest_page(repo, page_kind, int(params.get("page", 1)),
+                                          min(int(params.get("per_page", 30)), 100), params.get("direction") == "asc")
+            return (404, {"message": "Not Found"}) if items is None else (200, items)
+
+        self.handle_request("core", respond)
+
+    def do_POST(self):
+        if urlparse(self.path).path != "/graphql":
+            self.send_json(404, {"message": "Not Found"}, {})
+            return
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        query, variables = request.get("query", ""), request.get("variables") or {}
+        repo = f"{variables.get('owner')}/{variables.get('name')}"
+
+        def respond():
+            if "pullRequests" in query:
+                connection = self.source.pull_requests(repo, variables.get("cursor"), variables.get("pageSize", 100))
+                repository = None if connection is None else {"pullRequests": connection}
+            else:
+                aliases = ALIAS.findall(query)
+                # Like GitHub, a number outside GraphQL's 32-bit Int fails validation for the whole query
+                invalid = [alias for alias, num in aliases if int(num) > 2**31 - 1]
+                if invalid:
+                    return 200, {"errors": [{"message": f"Argument 'number' on Field '{alias}' has an invalid value. Expected type 'Int!'.",
+                                             "extensions": {"code": "argumentLiteralsIncompatible"}} for alias in invalid]}
+                repository = {alias: ({"title": title} if (title := self.source.issue_title(repo, int(num))) else None)
+                              for alias, num in aliases}
+            if repository is None:
+                return 200, {"data": {"repository": None}, "errors": [{"type": "NOT_FOUND", "message": f"Could not resolve {repo}"}]}
+            # Like GitHub, a missing number is a null alias plus a NOT_FOUND error
+            errors = [{"type": "NOT_FOUND", "path": ["repository", alias],
+                       "message": f"Could not resolve to an issue or pull request with the number of {alias[1:]}."}
+                      for alias, node in repository.items() if node is None]
+            return 200, {"data": {"repository": repository}, **({"errors": errors} if errors else {})}
+
+        self.handle_request("graphql", respond)
+
+def make_server(source, limiter=None, host=HOST, port=PORT, latency=0.0):
+    # port=0 picks a free port; the bound address is server.server_address
+    handler = type("Handler", (MockGitHubHandler,), {
+        "source": source, "limiter": limiter or RateLimiter(), "latency": latency,
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve synthetic or archived GitHub PR pages locally")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--archive", help="replay a PageArchive directory instead of synthetic pages")
+    parser.add_argument("--repos", type=int, default=REPO_COUNT, help=f"synthetic repos (default {REPO_COUNT})")
+    parser.add_argument("--prs-per-repo", type=int, default=PRS_PER_REPO, help=f"synthetic PRs per repo (default {PRS_PER_REPO})")
+    parser.add_argument("--users", type=int, default=USER_COUNT, help=f"synthetic PR authors (default {USER_COUNT})")
+    parser.add_argument("--spacing", type=int, default=SPACING_SECONDS,
+                        help=f"seconds between synthetic PRs of a repo (default {SPACING_SECONDS})")
+    parser.add_argument("--rate-limit", type=int, default=RATE_LIMIT, help=f"requests per window and resource (default {RATE_LIMIT})")
+    parser.add_argument("--rate-window", type=int, default=RATE_WINDOW_SECONDS, help=f"rate limit window in seconds (default {RATE_WINDOW_SECONDS})")
+    parser.add_argument("--secondary-every", type=int, default=0, help="answer every Nth request with 403 + Retry-After")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds for injected secondary limits")
+    parser.add_argument("--latency-ms", type=float, default=0, help="delay added to every response")
+    args = parser.parse_args()
+
+    if args.archive:
+        source = ArchiveSource(args.archive)
+    else:
+        source = SyntheticSource(args.repos, args.prs_per_repo, args.users, args.spacing)
+    limiter = RateLimiter(args.rate_limit, args.rate_window, args.secondary_every, args.retry_after)
+    server = make_server(source, limiter, args.host, args.port, args.latency_ms / 1000)
+    host, port = server.server_address[:2]
+    print(f"Mock GitHub API on http://{host}:{port} serving {len(source.repos)} repos")
+    print(f"  GITHUB_API_URL=http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()